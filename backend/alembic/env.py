@@ -4,6 +4,7 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
+from app.database import DATABASE_URL
 from app.models import Base
 
 target_metadata = Base.metadata
@@ -12,6 +13,9 @@ target_metadata = Base.metadata
 # access to the values within the .ini file in use.
 config = context.config
 
+# connect with the app's settings (.env or environment), like the API does
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
@@ -0,0 +1,47 @@
+"""invoice versions
+
+Revision ID: 0a8d4e6f2b19
+Revises: f7c1d9e3a5b6
+Create Date: 2026-10-18 16:05:12.401736
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a8d4e6f2b19'
+down_revision: Union[str, Sequence[str], None] = 'f7c1d9e3a5b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('invoices', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE invoices SET updated_at = created_at")
+    op.alter_column('invoices', 'updated_at', nullable=False)
+    op.add_column('user_stats', sa.Column('invoices_version', sa.Integer(), server_default='0', nullable=False))
+    op.alter_column('user_stats', 'invoices_version', server_default=None)
+    op.add_column('user_stats', sa.Column('invoices_updated_at', sa.DateTime(), nullable=True))
+    op.execute("""
+        UPDATE user_stats SET invoices_updated_at = latest.updated_at
+        FROM (
+            SELECT user_id, MAX(updated_at) AS updated_at FROM (
+                SELECT business_id AS user_id, updated_at FROM invoices
+                UNION ALL
+                SELECT customer_id, updated_at FROM invoices WHERE customer_id IS NOT NULL
+            ) AS touched
+            GROUP BY user_id
+        ) AS latest
+        WHERE user_stats.user_id = latest.user_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user_stats', 'invoices_updated_at')
+    op.drop_column('user_stats', 'invoices_version')
+    op.drop_column('invoices', 'updated_at')
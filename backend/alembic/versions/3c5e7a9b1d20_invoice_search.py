@@ -0,0 +1,53 @@
+"""invoice search
+
+Revision ID: 3c5e7a9b1d20
+Revises: 0a8d4e6f2b19
+Create Date: 2026-10-18 16:48:27.913054
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c5e7a9b1d20'
+down_revision: Union[str, Sequence[str], None] = '0a8d4e6f2b19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column('invoices', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    # same expression as crud.refresh_search_vectors
+    op.execute("""
+        UPDATE invoices SET search_vector =
+            setweight(to_tsvector('simple', coalesce(customer_name, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(products.names, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(business_name, '')), 'C')
+            || setweight(to_tsvector('simple', coalesce(notes, '')), 'D')
+        FROM (
+            SELECT invoices.id, string_agg(line_items.product_name, ' ') AS names
+            FROM invoices LEFT OUTER JOIN line_items ON line_items.invoice_id = invoices.id
+            GROUP BY invoices.id
+        ) AS products
+        WHERE products.id = invoices.id
+    """)
+    # built concurrently so existing deployments keep accepting writes
+    with op.get_context().autocommit_block():
+        op.create_index('ix_invoices_search_vector', 'invoices', ['search_vector'], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_invoices_customer_name_trgm', 'invoices', ['customer_name'], unique=False, postgresql_using='gin', postgresql_ops={'customer_name': 'gin_trgm_ops'}, postgresql_concurrently=True)
+        op.create_index('ix_invoices_customer_phone_trgm', 'invoices', ['customer_phone'], unique=False, postgresql_using='gin', postgresql_ops={'customer_phone': 'gin_trgm_ops'}, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_invoices_customer_phone_trgm', table_name='invoices', postgresql_concurrently=True)
+        op.drop_index('ix_invoices_customer_name_trgm', table_name='invoices', postgresql_concurrently=True)
+        op.drop_index('ix_invoices_search_vector', table_name='invoices', postgresql_concurrently=True)
+    op.drop_column('invoices', 'search_vector')
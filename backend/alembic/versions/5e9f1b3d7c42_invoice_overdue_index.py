@@ -0,0 +1,31 @@
+"""invoice overdue index
+
+Revision ID: 5e9f1b3d7c42
+Revises: 3c5e7a9b1d20
+Create Date: 2026-10-18 17:20:44.638217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9f1b3d7c42'
+down_revision: Union[str, Sequence[str], None] = '3c5e7a9b1d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # built concurrently so existing deployments keep accepting writes
+    with op.get_context().autocommit_block():
+        op.create_index('ix_invoices_sent_due_date', 'invoices', ['due_date'], unique=False, postgresql_where=sa.text("status = 'sent'"), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_invoices_sent_due_date', table_name='invoices', postgresql_where=sa.text("status = 'sent'"), postgresql_concurrently=True)
@@ -0,0 +1,91 @@
+"""invoice access indexes
+
+Revision ID: 7b3f9c2a41e0
+Revises: d5e40cc18d64
+Create Date: 2026-10-18 14:10:02.113427
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3f9c2a41e0'
+down_revision: Union[str, Sequence[str], None] = 'd5e40cc18d64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = (
+    'ix_invoices_business_id_created_at',
+    'ix_invoices_customer_id_created_at',
+    'ix_line_items_invoice_id',
+    'ix_user_stats_user_id',
+)
+
+# The init schema allowed several user_stats rows per user. Keep the
+# oldest one and recount its totals from invoices, the way
+# crud.rebuild_user_stats does, so the unique index can be built.
+MERGE_DUPLICATE_USER_STATS = (
+    """
+    CREATE TEMP TABLE duplicate_user_stats ON COMMIT DROP AS
+    SELECT user_id, min(id) AS keep_id FROM user_stats GROUP BY user_id HAVING count(*) > 1
+    """,
+    """
+    DELETE FROM user_stats s USING duplicate_user_stats d
+    WHERE s.user_id = d.user_id AND s.id <> d.keep_id
+    """,
+    """
+    UPDATE user_stats s SET
+        total_invoices_sent = (SELECT count(*) FROM invoices WHERE business_id = s.user_id),
+        total_amount_paid_in = (
+            SELECT coalesce(sum(total_amount), 0) FROM invoices
+            WHERE business_id = s.user_id AND status = 'paid'
+        ),
+        total_invoices_received = (SELECT count(*) FROM invoices WHERE customer_id = s.user_id),
+        total_amount_paid_out = (
+            SELECT coalesce(sum(total_amount), 0) FROM invoices
+            WHERE customer_id = s.user_id AND status = 'paid'
+        )
+    FROM duplicate_user_stats d
+    WHERE s.id = d.keep_id
+    """,
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for statement in MERGE_DUPLICATE_USER_STATS:
+        op.execute(statement)
+
+    # built concurrently so existing deployments keep accepting writes
+    with op.get_context().autocommit_block():
+        # a concurrent build that failed leaves an INVALID index behind under its name
+        invalid = op.get_bind().execute(
+            sa.text(
+                """
+                SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE NOT i.indisvalid AND c.relname = ANY(:names)
+                """
+            ),
+            {"names": list(INDEXES)},
+        ).scalars().all()
+        for name in invalid:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+        # if_not_exists: the indexes built before a failed run are kept
+        op.create_index('ix_invoices_business_id_created_at', 'invoices', ['business_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_invoices_customer_id_created_at', 'invoices', ['customer_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index(op.f('ix_line_items_invoice_id'), 'line_items', ['invoice_id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index(op.f('ix_user_stats_user_id'), 'user_stats', ['user_id'], unique=True, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_user_stats_user_id'), table_name='user_stats', postgresql_concurrently=True)
+        op.drop_index(op.f('ix_line_items_invoice_id'), table_name='line_items', postgresql_concurrently=True)
+        op.drop_index('ix_invoices_customer_id_created_at', table_name='invoices', postgresql_concurrently=True)
+        op.drop_index('ix_invoices_business_id_created_at', table_name='invoices', postgresql_concurrently=True)
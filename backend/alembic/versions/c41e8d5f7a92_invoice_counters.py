@@ -0,0 +1,47 @@
+"""invoice counters
+
+Revision ID: c41e8d5f7a92
+Revises: 7b3f9c2a41e0
+Create Date: 2026-10-18 14:32:47.520193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e8d5f7a92'
+down_revision: Union[str, Sequence[str], None] = '7b3f9c2a41e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('invoice_counters',
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('last_number', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['business_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('business_id')
+    )
+    # continue each business from the highest number it has already used
+    op.execute("""
+        INSERT INTO invoice_counters (business_id, last_number)
+        SELECT business_id, MAX(number) FROM (
+            SELECT business_id, CAST(split_part(invoice_number, '-', 3) AS INTEGER) AS number
+            FROM invoices
+            WHERE invoice_number ~ '^INV-[0-9]+-[0-9]+$'
+            UNION ALL
+            SELECT user_id, total_invoices_sent
+            FROM user_stats
+            WHERE total_invoices_sent > 0
+        ) AS used
+        GROUP BY business_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('invoice_counters')
@@ -0,0 +1,48 @@
+"""sms outbox
+
+Revision ID: e2a6b8d0c3f4
+Revises: c41e8d5f7a92
+Create Date: 2026-10-18 15:02:11.904317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a6b8d0c3f4'
+down_revision: Union[str, Sequence[str], None] = 'c41e8d5f7a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sms_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('invoice_id', sa.Integer(), nullable=True),
+    sa.Column('phone_number', sa.String(), nullable=False),
+    sa.Column('message', sa.String(), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'sent', 'failed', name='smsstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('provider_message_id', sa.String(), nullable=True),
+    sa.Column('provider_status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sms_outbox_id'), 'sms_outbox', ['id'], unique=False)
+    op.create_index('ix_sms_outbox_pending_next_attempt_at', 'sms_outbox', ['next_attempt_at'], unique=False, postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sms_outbox_pending_next_attempt_at', table_name='sms_outbox', postgresql_where=sa.text("status = 'pending'"))
+    op.drop_index(op.f('ix_sms_outbox_id'), table_name='sms_outbox')
+    op.drop_table('sms_outbox')
+    sa.Enum(name='smsstatus').drop(op.get_bind(), checkfirst=False)
@@ -0,0 +1,43 @@
+"""invoice daily rollups
+
+Revision ID: f7c1d9e3a5b6
+Revises: e2a6b8d0c3f4
+Create Date: 2026-10-18 15:40:36.118205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c1d9e3a5b6'
+down_revision: Union[str, Sequence[str], None] = 'e2a6b8d0c3f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('invoice_daily_rollups',
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', postgresql.ENUM('sent', 'paid', 'overdue', 'cancelled', 'draft', name='invoicestatus', create_type=False), nullable=False),
+    sa.Column('invoice_count', sa.Integer(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['business_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('business_id', 'day', 'status')
+    )
+    op.execute("""
+        INSERT INTO invoice_daily_rollups (business_id, day, status, invoice_count, total_amount)
+        SELECT business_id, CAST(created_at AS DATE), status, COUNT(*), SUM(total_amount)
+        FROM invoices
+        GROUP BY business_id, CAST(created_at AS DATE), status
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('invoice_daily_rollups')
@@ -0,0 +1,232 @@
+"""Dashboard aggregates for a business, computed in SQL.
+
+Revenue per period and the status breakdown read invoice_daily_rollups,
+one row per business, day and status kept current by crud on every
+invoice write. Set ANALYTICS_USE_ROLLUPS=false to aggregate invoices
+directly instead. Aging depends on today's date and top customers and
+products on columns the rollup does not carry, so those always query
+invoices and line_items, bounded by the business and date range.
+"""
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Date, and_, case, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, schemas
+from .config import settings
+
+
+OUTSTANDING = (models.InvoiceStatus.sent, models.InvoiceStatus.overdue)
+
+# (label, first day overdue, last day overdue); None is unbounded
+AGING_BUCKETS = (
+    ("current", None, 0),
+    ("1-30", 1, 30),
+    ("31-60", 31, 60),
+    ("61-90", 61, 90),
+    ("90+", 91, None),
+)
+
+
+def _date_range(params: schemas.AnalyticsParams) -> tuple[date, date]:
+    date_to = params.date_to or date.today()
+    date_from = params.date_from or date_to - timedelta(days=365)
+    return date_from, date_to
+
+
+def _amount_where(amount, condition):
+    return func.coalesce(func.sum(amount).filter(condition), 0.0)
+
+
+async def revenue_by_period(
+    db: AsyncSession, business_id: int, period: str, date_from: date, date_to: date
+):
+    if settings.analytics_use_rollups:
+        source = models.InvoiceDailyRollup
+        day = source.day
+        invoices = func.sum(source.invoice_count)
+        total = source.total_amount
+        in_range = and_(
+            source.business_id == business_id, day >= date_from, day <= date_to
+        )
+    else:
+        source = models.Invoice
+        day = source.created_at
+        invoices = func.count()
+        total = source.total_amount
+        in_range = and_(
+            source.business_id == business_id,
+            day >= datetime.combine(date_from, time.min),
+            day < datetime.combine(date_to + timedelta(days=1), time.min),
+        )
+    bucket = func.cast(func.date_trunc(period, day), Date).label("period")
+    rows = await db.execute(
+        select(
+            bucket,
+            func.coalesce(invoices, 0).label("invoice_count"),
+            func.coalesce(func.sum(total), 0.0).label("total_amount"),
+            _amount_where(total, source.status == models.InvoiceStatus.paid).label("paid_amount"),
+            _amount_where(total, source.status.in_(OUTSTANDING)).label("outstanding_amount"),
+        )
+        .where(in_range)
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+    return [schemas.AnalyticsPeriodOut.model_validate(row) for row in rows.mappings()]
+
+
+async def status_breakdown(
+    db: AsyncSession, business_id: int, date_from: date, date_to: date
+):
+    if settings.analytics_use_rollups:
+        source = models.InvoiceDailyRollup
+        invoices = func.sum(source.invoice_count)
+        in_range = and_(
+            source.business_id == business_id,
+            source.day >= date_from,
+            source.day <= date_to,
+        )
+    else:
+        source = models.Invoice
+        invoices = func.count()
+        in_range = and_(
+            source.business_id == business_id,
+            source.created_at >= datetime.combine(date_from, time.min),
+            source.created_at < datetime.combine(date_to + timedelta(days=1), time.min),
+        )
+    rows = await db.execute(
+        select(
+            source.status,
+            invoices.label("invoice_count"),
+            func.sum(source.total_amount).label("total_amount"),
+        )
+        .where(in_range)
+        .group_by(source.status)
+        .having(invoices > 0)
+        .order_by(source.status)
+    )
+    return [
+        schemas.AnalyticsStatusOut(
+            status=row.status.value,
+            invoice_count=row.invoice_count,
+            total_amount=row.total_amount,
+        )
+        for row in rows
+    ]
+
+
+async def overdue_aging(db: AsyncSession, business_id: int, today: date):
+    """Outstanding invoices by days past due, as of ``today``."""
+    invoice = models.Invoice
+    days_overdue = literal(today, Date) - func.cast(invoice.due_date, Date)
+    whens = []
+    for label, first, last in AGING_BUCKETS:
+        conditions = []
+        if first is not None:
+            conditions.append(days_overdue >= first)
+        if last is not None:
+            conditions.append(days_overdue <= last)
+        whens.append((and_(*conditions), label))
+    bucket = case(*whens).label("bucket")
+    rows = await db.execute(
+        select(
+            bucket,
+            func.count().label("invoice_count"),
+            func.sum(invoice.total_amount).label("total_amount"),
+        )
+        .where(invoice.business_id == business_id, invoice.status.in_(OUTSTANDING))
+        .group_by(bucket)
+    )
+    found = {row.bucket: row for row in rows}
+    return [
+        schemas.AnalyticsAgingOut(
+            bucket=label,
+            invoice_count=found[label].invoice_count if label in found else 0,
+            total_amount=found[label].total_amount if label in found else 0.0,
+        )
+        for label, _, _ in AGING_BUCKETS
+    ]
+
+
+async def top_customers(
+    db: AsyncSession, business_id: int, date_from: date, date_to: date, limit: int
+):
+    """Customers ranked by invoiced amount; anonymous ones are grouped by name and phone."""
+    invoice = models.Invoice
+    total = func.sum(invoice.total_amount)
+    ranked = (
+        select(
+            invoice.customer_name,
+            invoice.customer_phone,
+            func.count().label("invoice_count"),
+            total.label("total_amount"),
+            _amount_where(
+                invoice.total_amount, invoice.status == models.InvoiceStatus.paid
+            ).label("paid_amount"),
+            func.rank().over(order_by=total.desc()).label("rank"),
+        )
+        .where(
+            invoice.business_id == business_id,
+            invoice.status != models.InvoiceStatus.cancelled,
+            invoice.created_at >= datetime.combine(date_from, time.min),
+            invoice.created_at < datetime.combine(date_to + timedelta(days=1), time.min),
+        )
+        .group_by(invoice.customer_name, invoice.customer_phone)
+        .subquery()
+    )
+    rows = await db.execute(
+        select(ranked)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.rank, ranked.c.customer_name)
+    )
+    return [schemas.AnalyticsCustomerOut.model_validate(row) for row in rows.mappings()]
+
+
+async def top_products(
+    db: AsyncSession, business_id: int, date_from: date, date_to: date, limit: int
+):
+    invoice = models.Invoice
+    item = models.LineItem
+    total = func.sum(item.transaction_value)
+    ranked = (
+        select(
+            item.product_name,
+            func.sum(item.quantity).label("quantity"),
+            total.label("total_amount"),
+            func.rank().over(order_by=total.desc()).label("rank"),
+        )
+        .join(invoice, invoice.id == item.invoice_id)
+        .where(
+            invoice.business_id == business_id,
+            invoice.status != models.InvoiceStatus.cancelled,
+            invoice.created_at >= datetime.combine(date_from, time.min),
+            invoice.created_at < datetime.combine(date_to + timedelta(days=1), time.min),
+        )
+        .group_by(item.product_name)
+        .subquery()
+    )
+    rows = await db.execute(
+        select(ranked)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.rank, ranked.c.product_name)
+    )
+    return [schemas.AnalyticsProductOut.model_validate(row) for row in rows.mappings()]
+
+
+async def get_dashboard(
+    db: AsyncSession, business_id: int, params: schemas.AnalyticsParams
+) -> schemas.AnalyticsDashboardOut:
+    date_from, date_to = _date_range(params)
+    revenue = await revenue_by_period(db, business_id, params.period, date_from, date_to)
+    return schemas.AnalyticsDashboardOut(
+        period=params.period,
+        date_from=date_from,
+        date_to=date_to,
+        paid_amount=sum(row.paid_amount for row in revenue),
+        outstanding_amount=sum(row.outstanding_amount for row in revenue),
+        revenue=revenue,
+        statuses=await status_breakdown(db, business_id, date_from, date_to),
+        aging=await overdue_aging(db, business_id, date.today()),
+        top_customers=await top_customers(db, business_id, date_from, date_to, params.top),
+        top_products=await top_products(db, business_id, date_from, date_to, params.top),
+    )
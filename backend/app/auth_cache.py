@@ -0,0 +1,26 @@
+from sqlalchemy import event, inspect
+
+from . import models
+from .cache import TTLCache
+from .config import settings
+
+
+# Auth fields of recently seen users, keyed by JWT subject (username).
+# Entries are per process: other workers see a change once their own
+# entry expires, so the TTL bounds how long a disabled user keeps access.
+auth_user_cache = TTLCache(
+    maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl_seconds
+)
+
+
+def invalidate_user(username: str):
+    auth_user_cache.pop(username)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_on_write(mapper, connection, target: models.User):
+    # ORM writes only; bulk UPDATE statements must call invalidate_user
+    history = inspect(target).attrs.username.history
+    for username in (*history.deleted, target.username):
+        invalidate_user(username)
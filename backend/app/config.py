@@ -12,14 +12,75 @@ class Settings(BaseSettings):
     secret_key: str
     algorithm: str
     access_token_expire_minutes: int
+    bcrypt_rounds: int = 12  # changing it rehashes passwords on next login
+    password_hash_workers: int = 4
+    auth_cache_size: int = 1024  # 0 disables the authenticated-user cache
+    auth_cache_ttl_seconds: float = 60
     # allowed_origins: list[str] = ["http://localhost:5173"]
     at_key: str | None = None
     at_username: str | None = None
+    # SMS outbox (see app/notifications.py)
+    sms_transport: str = "africastalking"  # or "fake" to record sends in memory
+    sms_worker_enabled: bool = False  # run the dispatcher inside the API process
+    sms_invoice_notifications: bool = False  # text customers new invoices
+    sms_batch_size: int = 500  # outbox rows claimed per poll
+    sms_recipients_per_request: int = 100
+    sms_rate_per_second: float = 10  # recipients per second, 0 for unlimited
+    sms_max_attempts: int = 5
+    sms_retry_base_seconds: float = 30
+    sms_retry_max_seconds: float = 3600
+    sms_lease_seconds: float = 300
+    sms_poll_interval_seconds: float = 5
+    # overdue sweep (see app/jobs/overdue.py)
+    overdue_sweep_enabled: bool = False  # run the sweep inside the API process
+    overdue_sweep_interval_seconds: float = 300
+    overdue_chunk_size: int = 1000  # invoices per transaction
+    overdue_reminders: bool = False  # text customers when an invoice becomes overdue
     database_name: str
     database_user: str
     database_password: str
     database_host: str
     database_port: int
+    # connection pool, per engine and per worker process
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30  # seconds to wait for a free connection
+    db_pool_recycle: int = 1800  # seconds before a connection is replaced
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 0  # 0 leaves the server default
+    db_counter_pool_size: int = 2  # invoice number reservations
+    # connections all API workers together may open; when set, each worker's
+    # pool is sized from its share (see database.pool_limits). 0 uses
+    # db_pool_size and db_max_overflow as they are
+    db_max_connections: int = 0
+    # production server (see app/server.py)
+    server_workers: int = 0  # worker processes, 0 for one per CPU
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_keepalive_seconds: int = 5  # keep above the load balancer's idle timeout
+    server_graceful_timeout_seconds: int = 30  # for in-flight requests on shutdown
+    server_forwarded_allow_ips: str = "127.0.0.1"  # proxies trusted for X-Forwarded-*
+    # invoice numbers reserved per counter update; >1 trades gaps for fewer writes
+    invoice_number_block_size: int = 1
+    invoice_batch_chunk_size: int = 500  # invoices per transaction in batch creation
+    invoice_cache_size: int = 1024  # single invoice lookups, 0 disables the cache
+    invoice_cache_ttl_seconds: float = 30
+    # PDF invoices (see app/pdf.py)
+    pdf_render_workers: int = 2  # worker processes
+    pdf_cache_size: int = 256  # rendered documents kept, 0 disables the cache
+    pdf_cache_ttl_seconds: float = 3600
+    invoice_import_chunk_size: int = 1000  # invoices per COPY into the import staging tables
+    export_yield_per: int = 1000  # rows fetched per cursor round trip in exports
+    # dashboard revenue and status totals from invoice_daily_rollups (see app/analytics.py)
+    analytics_use_rollups: bool = True
+    # encode invoice lists from ORM rows without validating them again (see app/serialization.py)
+    serialization_trusted_rows: bool = False
+    # request instrumentation (see app/instrumentation.py)
+    request_metrics_sample_rate: float = 0.1  # share of requests measured, 0 to 1
+    server_timing_enabled: bool = True  # Server-Timing header on measured responses
+    # shared secret for /internal endpoints and /metrics, sent as X-Internal-Token;
+    # unset, those routes answer 404
+    internal_token: str | None = None
 
 
 settings = Settings(_env_file='.env', _env_file_encoding='utf-8') # type: ignore
\ No newline at end of file
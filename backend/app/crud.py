@@ -1,30 +1,43 @@
+import re
+from datetime import datetime
 from typing import Optional
-from sqlalchemy.orm import Session
-from . import models, schemas
-from .security import get_password_hash
-from .db_utils import generate_unique_username, generate_invoice_number
-
-
-def get_user(db: Session, username: str):
-    return db.query(models.User).filter(models.User.username == username).first()
+from sqlalchemy import (
+    Date, and_, delete, func, insert, literal_column, or_, select, tuple_, union_all, update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from . import models, pdf, schemas
+from .invoice_cache import CachedInvoice, invalidate_invoice, invoice_cache
+from .config import settings
+from .security import hash_password_async
+from .db_utils import generate_unique_username, generate_invoice_numbers
+from .utils import encode_cursor, decode_cursor, format_invoice
+
+
+async def get_user(db: AsyncSession, username: str):
+    return await db.scalar(
+        select(models.User).where(models.User.username == username)
+    )
 
 
-def get_user_by_phone(db: Session, phone_number: str):
-    return (
-        db.query(models.User).filter(models.User.phone_number == phone_number).first()
+async def get_user_by_phone(db: AsyncSession, phone_number: str):
+    return await db.scalar(
+        select(models.User).where(models.User.phone_number == phone_number)
     )
 
 
-def create_user(db: Session, user: schemas.UserCreate):
-    username = generate_unique_username(db, user.full_name)
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    username = await generate_unique_username(db, user.full_name)
     db_user = models.User(
         username=username,
         full_name=user.full_name,
         phone_number=user.phone_number,
-        password=get_password_hash(user.password),
+        password=await hash_password_async(user.password),
     )
     db.add(db_user)
-    db.flush()
+    await db.flush()
     db_user_stats = models.UserStats(
         user_id=db_user.id,
         total_invoices_sent=0,
@@ -34,171 +47,858 @@ def create_user(db: Session, user: schemas.UserCreate):
     )
     db.add(db_user_stats)
 
-    db.commit()
-    db.refresh(db_user)
-    db.refresh(db_user_stats)
+    await db.commit()
+    await db.refresh(db_user)
+    await db.refresh(db_user_stats)
 
     return db_user
 
 
-def get_all_user_invoices(db: Session, username: str):
-    user = get_user(db, username)
+def _invoice_out_select():
+    """Invoice query with everything InvoiceOut serializes loaded up front.
+
+    Line items come in one extra SELECT ... IN for the whole page and the
+    customer is joined, so the statement count does not grow with the
+    number of invoices returned. Eager loading is also what makes the
+    results safe to serialize outside the async session.
+    """
+    return select(models.Invoice).options(
+        selectinload(models.Invoice.line_items),
+        joinedload(models.Invoice.customer),
+    )
+
+
+async def _get_invoice(db: AsyncSession, invoice_id: int):
+    """Reload an invoice with its relationships after a write."""
+    return await db.scalar(
+        _invoice_out_select()
+        .where(models.Invoice.id == invoice_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+def _list_conditions(params: schemas.InvoiceListParams) -> list:
+    """WHERE clauses for the list filters and the keyset cursor."""
+    conditions = []
+    if params.status:
+        conditions.append(models.Invoice.status == models.InvoiceStatus(params.status))
+    if params.due_from:
+        conditions.append(models.Invoice.due_date >= params.due_from)
+    if params.due_to:
+        conditions.append(models.Invoice.due_date <= params.due_to)
+    if params.customer_phone:
+        conditions.append(models.Invoice.customer_phone == params.customer_phone)
+    if params.cursor:
+        created_at, invoice_id = decode_cursor(params.cursor)
+        conditions.append(
+            tuple_(models.Invoice.created_at, models.Invoice.id)
+            < tuple_(created_at, invoice_id)
+        )
+    return conditions
+
+
+def _newest_first():
+    return models.Invoice.created_at.desc(), models.Invoice.id.desc()
+
+
+async def _invoice_page(db: AsyncSession, query, limit: int):
+    """Run an ordered query for limit + 1 rows; returns (invoices, next_cursor)."""
+    invoices = list(await db.scalars(query.order_by(*_newest_first()).limit(limit + 1)))
+    next_cursor = None
+    if len(invoices) > limit:
+        invoices = invoices[:limit]
+        last = invoices[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return invoices, next_cursor
+
+
+async def _paginate_invoices(
+    db: AsyncSession, query, params: schemas.InvoiceListParams
+):
+    """Apply filters and keyset pagination on (created_at, id), newest first."""
+    return await _invoice_page(db, query.where(*_list_conditions(params)), params.limit)
+
+
+async def get_all_user_invoices(
+    db: AsyncSession, username: str, params: schemas.InvoiceListParams
+):
+    """Invoices the user sent or received, newest first.
+
+    ``business_id = X OR customer_id = X`` can use neither keyset index, so
+    each side is its own ordered, limited scan of its index and only the
+    two pages are merged. Invoices a user sent to themselves are listed
+    from the business side only.
+    """
+    user = await get_user(db, username)
     if not user:
-        return []
-    return (
-        db.query(models.Invoice)
-        .filter(
-            (models.Invoice.business_id == user.id)
-            | (models.Invoice.customer_id == user.id)
+        return [], None
+    invoice = models.Invoice
+    conditions = _list_conditions(params)
+    sides = [
+        select(invoice.id)
+        .where(side, *conditions)
+        .order_by(*_newest_first())
+        .limit(params.limit + 1)
+        for side in (
+            invoice.business_id == user.id,
+            and_(invoice.customer_id == user.id, invoice.business_id != user.id),
         )
-        .all()
+    ]
+    page = union_all(*sides).subquery()
+    return await _invoice_page(
+        db, _invoice_out_select().join(page, page.c.id == invoice.id), params.limit
+    )
+
+
+async def get_invoices_by_business(
+    db: AsyncSession, business_id: int, params: schemas.InvoiceListParams
+):
+    return await _paginate_invoices(
+        db,
+        _invoice_out_select().where(models.Invoice.business_id == business_id),
+        params,
     )
 
 
-def get_invoices_by_business(db: Session, business_id: int):
-    return (
-        db.query(models.Invoice).filter(models.Invoice.business_id == business_id).all()
+async def get_invoices_by_customer(
+    db: AsyncSession, customer_id: int, params: schemas.InvoiceListParams
+):
+    return await _paginate_invoices(
+        db,
+        _invoice_out_select().where(models.Invoice.customer_id == customer_id),
+        params,
     )
 
 
-def get_invoices_by_customer(db: Session, customer_id: int):
-    return (
-        db.query(models.Invoice).filter(models.Invoice.customer_id == customer_id).all()
+async def get_invoice_list_version(db: AsyncSession, user_id: int):
+    """(invoices_version, invoices_updated_at) of a user, for list validators."""
+    row = await db.execute(
+        select(models.UserStats.invoices_version, models.UserStats.invoices_updated_at)
+        .where(models.UserStats.user_id == user_id)
     )
+    return row.one_or_none() or (0, None)
 
 
-def get_business_invoice(db: Session, business_id: int, invoice_number: str):
-    return (
-        db.query(models.Invoice)
-        .filter(
+async def get_invoice_for_user(db: AsyncSession, user_id: int, invoice_number: str):
+    """An invoice the user either sent or received, with its relationships.
+
+    One query: the unique invoice_number index finds the row, ownership is
+    part of the WHERE clause and line items and customer are joined in.
+    """
+    result = await db.scalars(
+        select(models.Invoice)
+        .options(
+            joinedload(models.Invoice.line_items),
+            joinedload(models.Invoice.customer),
+        )
+        .where(
+            models.Invoice.invoice_number == invoice_number,
+            (models.Invoice.business_id == user_id)
+            | (models.Invoice.customer_id == user_id),
+        )
+    )
+    return result.unique().one_or_none()
+
+
+async def get_cached_invoice(
+    db: AsyncSession, user_id: int, invoice_number: str
+) -> Optional[CachedInvoice]:
+    """Read-through lookup of a serialized invoice the user may see."""
+    cached = invoice_cache.get(invoice_number)
+    if cached is None:
+        invoice = await get_invoice_for_user(db, user_id, invoice_number)
+        if invoice is None:
+            return None
+        cached = CachedInvoice(
+            id=invoice.id,
+            business_id=invoice.business_id,
+            customer_id=invoice.customer_id,
+            updated_at=invoice.updated_at,
+            data=schemas.InvoiceOut.model_validate(invoice),
+        )
+        invoice_cache.set(invoice_number, cached)
+    return cached if cached.visible_to(user_id) else None
+
+
+async def get_business_invoice(
+    db: AsyncSession, business_id: int, invoice_number: str
+):
+    return await db.scalar(
+        _invoice_out_select().where(
             models.Invoice.business_id == business_id,
             models.Invoice.invoice_number == invoice_number,
         )
-        .first()
     )
 
 
-def create_invoice(
-    db: Session, invoice: schemas.InvoiceCreate, customer_id: Optional[int] = None
+# no stemming: names and mixed-language notes
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+
+def _weighted_vector(text, weight: str):
+    return func.setweight(
+        func.to_tsvector(SEARCH_CONFIG, func.coalesce(text, "")), literal_column(f"'{weight}'")
+    )
+
+
+async def refresh_search_vectors(db: AsyncSession, where):
+    """Recompute invoices.search_vector for the invoices matching ``where``.
+
+    Customer name weighs most, then product names, business name and
+    notes. Call it after the invoice and its line items are written.
+    """
+    invoices = models.Invoice.__table__
+    products = (
+        select(func.string_agg(models.LineItem.product_name, " "))
+        .where(models.LineItem.invoice_id == invoices.c.id)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(invoices)
+        .where(where)
+        .values(
+            search_vector=_weighted_vector(invoices.c.customer_name, "A")
+            .op("||")(_weighted_vector(products, "B"))
+            .op("||")(_weighted_vector(invoices.c.business_name, "C"))
+            .op("||")(_weighted_vector(invoices.c.notes, "D")),
+            # not an edit: keep the column's onupdate from firing
+            updated_at=invoices.c.updated_at,
+        )
+    )
+
+
+def _prefix_tsquery(text: str) -> Optional[str]:
+    """'jane mai' -> 'jane:* & mai:*', so partly typed words match."""
+    words = re.findall(r"\w+", text.lower())
+    return " & ".join(f"{word}:*" for word in words) or None
+
+
+async def search_invoices(
+    db: AsyncSession, business_id: int, params: schemas.InvoiceSearchParams
 ):
-    # Get business_id
-    business = (
-        db.query(models.User).filter(models.User.username == invoice.username).first()
-    )
-    if not business:
-        raise ValueError("Business user not found")
-    business_id = business.id
-
-    # Create invoice object
-    db_invoice = models.Invoice(
-        business_id=business_id,
-        business_name=invoice.business_name,
-        customer_id=customer_id,
-        customer_name=invoice.customer.full_name if invoice.customer else invoice.customer_name,
-        customer_phone=invoice.customer.phone_number if invoice.customer else invoice.customer_phone,
-        total_amount=invoice.total_amount,
-        due_date=invoice.due_date,
-        status=invoice.status,
-        notes=invoice.notes,
-        invoice_number=generate_invoice_number(db, business_id),
-    )
-    db.add(db_invoice)
-    db.flush()
-
-    # Add line items
+    """Rank a business's invoices against a free-text query.
+
+    Words match the search vector by prefix; the customer name also
+    matches by trigram word similarity, so typos still find it, and digits
+    match anywhere in the customer phone. Returns (invoices, next_cursor);
+    the cursor is the offset of the next page.
+    """
+    invoice = models.Invoice
+    query = params.q.strip()
+    matches = [invoice.customer_name.op("%>")(query)]
+    rank = func.word_similarity(query, invoice.customer_name)
+
+    tsquery = _prefix_tsquery(query)
+    if tsquery:
+        ts = func.to_tsquery(SEARCH_CONFIG, tsquery)
+        matches.append(invoice.search_vector.op("@@")(ts))
+        rank = rank + func.ts_rank_cd(invoice.search_vector, ts)
+
+    digits = re.sub(r"\D", "", query)
+    if len(digits) >= 3:
+        # one bound pattern, so the trigram index applies
+        matches.append(invoice.customer_phone.like(f"%{digits}%"))
+        rank = rank + func.similarity(invoice.customer_phone, digits)
+
+    try:
+        offset = int(params.cursor) if params.cursor else 0
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if offset < 0:
+        raise ValueError("Invalid cursor")
+
+    invoices = list(
+        await db.scalars(
+            _invoice_out_select()
+            .where(invoice.business_id == business_id, or_(*matches))
+            .order_by(rank.desc(), invoice.created_at.desc(), invoice.id.desc())
+            .offset(offset)
+            .limit(params.limit + 1)
+        )
+    )
+    next_cursor = None
+    if len(invoices) > params.limit:
+        invoices = invoices[: params.limit]
+        next_cursor = str(offset + params.limit)
+    return invoices, next_cursor
+
+
+def line_item_values(items: list[schemas.LineItemCreate]) -> tuple[list[dict], float]:
+    """Column values for a batch of line items, plus their summed total."""
+    rows = []
     total_amount = 0
-    for item in invoice.line_items:
+    for item in items:
         transaction_value = item.unit_price * item.quantity
         total_amount += transaction_value
-        db_item = models.LineItem(
-            invoice_id=db_invoice.id,
-            product_name=item.product_name,
-            unit_price=item.unit_price,
-            quantity=item.quantity,
-            transaction_value=transaction_value,
-            description=item.description,
-            type=item.type,
+        rows.append(
+            {
+                "product_name": item.product_name,
+                "unit_price": item.unit_price,
+                "quantity": item.quantity,
+                "transaction_value": transaction_value,
+                "description": item.description,
+                "type": item.type or models.LineItemTypeEnum.product.value,
+            }
         )
-        db.add(db_item)
-
-    # Correct total amount if needed
-    if total_amount != invoice.total_amount:
-        db_invoice.total_amount = total_amount
+    return rows, total_amount
+
+
+def customer_phone(invoice: schemas.InvoiceCreate) -> Optional[str]:
+    """The phone the invoice is addressed to, from the customer if one is given."""
+    return invoice.customer.phone_number if invoice.customer else invoice.customer_phone
+
+
+def invoice_values(
+    invoice: schemas.InvoiceCreate,
+    business_id: int,
+    customer_id: Optional[int],
+    invoice_number: str,
+    total_amount: float,
+) -> dict:
+    now = datetime.now()
+    return {
+        "business_id": business_id,
+        "business_name": invoice.business_name,
+        "customer_id": customer_id,
+        "customer_name": invoice.customer.full_name if invoice.customer else invoice.customer_name,
+        "customer_phone": customer_phone(invoice),
+        "total_amount": total_amount,
+        "due_date": invoice.due_date,
+        "status": invoice.status,
+        "notes": invoice.notes or "",
+        "invoice_number": invoice_number,
+        # set here rather than by the column default so the rollup day is known
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def create_invoice(
+    db: AsyncSession,
+    invoice: schemas.InvoiceCreate,
+    customer_id: Optional[int] = None,
+    business_id: Optional[int] = None,
+):
+    """Create an invoice, its line items and the stats updates in one transaction.
+
+    The total is always recomputed from the line items. Line items go in
+    as a single executemany INSERT.
+    """
+    if business_id is None:
+        business = await get_user(db, invoice.username)
+        if not business:
+            raise ValueError("Business user not found")
+        business_id = business.id
+    [invoice_number] = await generate_invoice_numbers(business_id)
+
+    line_items, total_amount = line_item_values(invoice.line_items)
+    values = invoice_values(invoice, business_id, customer_id, invoice_number, total_amount)
+    invoice_id = await db.scalar(
+        insert(models.Invoice).values(values).returning(models.Invoice.id)
+    )
+    if line_items:
+        # Core insert on the table: the ORM bulk path would split the batch
+        # on rows whose optional columns are None
+        await db.execute(
+            insert(models.LineItem.__table__),
+            [{**row, "invoice_id": invoice_id} for row in line_items],
+        )
+    await refresh_search_vectors(db, models.Invoice.id == invoice_id)
 
-    # update customer and business stats
-    if customer_id:
-        update_customer_stats(db, customer_id, db_invoice)
-    update_business_stats(db, business_id, db_invoice)
+    paid = _paid_amount(invoice.status, total_amount)
+    await update_invoice_stats(
+        db, business_id, (1, paid), {customer_id: (1, paid)} if customer_id else {}
+    )
+    rollups = {}
+    add_rollup_delta(rollups, business_id, values["created_at"], invoice.status, 1, total_amount)
+    await update_invoice_rollups(db, rollups)
+
+    db_invoice = await _get_invoice(db, invoice_id)
+    if settings.sms_invoice_notifications and db_invoice.customer_phone:
+        enqueue_sms(
+            db, db_invoice.customer_phone, format_invoice(db_invoice), invoice_id=invoice_id
+        )
 
-    db.commit()
-    db.refresh(db_invoice)
+    await db.commit()
 
     return db_invoice
 
 
-def update_invoice(
-    db: Session, invoice: models.Invoice, invoice_data: schemas.InvoiceUpdate
+def invoice_row_error(invoice: schemas.InvoiceCreate, username: str) -> Optional[str]:
+    """Why a batch or imported invoice is rejected, or None if it is valid."""
+    if invoice.username != username:
+        return "Unauthorized"
+    if (invoice.customer and not invoice.customer.full_name) and not invoice.customer_name:
+        return "Customer name is required"
+    try:
+        models.InvoiceStatus(invoice.status)
+    except ValueError:
+        return f"Invalid status '{invoice.status}'"
+    for item in invoice.line_items:
+        if item.type is not None:
+            try:
+                models.LineItemTypeEnum(item.type)
+            except ValueError:
+                return f"Invalid line item type '{item.type}'"
+    return None
+
+
+async def get_user_ids_by_phone(db: AsyncSession, phone_numbers: set[str]) -> dict[str, int]:
+    if not phone_numbers:
+        return {}
+    rows = await db.execute(
+        select(models.User.phone_number, models.User.id).where(
+            models.User.phone_number.in_(phone_numbers)
+        )
+    )
+    return dict(rows.tuples().all())
+
+
+async def create_invoices_batch(
+    db: AsyncSession,
+    business_id: int,
+    username: str,
+    invoices: list[schemas.InvoiceCreate],
+    chunk_size: int = settings.invoice_batch_chunk_size,
+) -> list[schemas.InvoiceBatchResult]:
+    """Create many invoices for one business, reporting a result per row.
+
+    Customers are resolved in one query and invoice numbers reserved as one
+    block. Each chunk is a transaction: one executemany INSERT for the
+    invoices, one for their line items and one stats UPDATE per user, plus
+    the customers' SMS when sms_invoice_notifications is on. A chunk that
+    fails is rolled back and reported without stopping the rest.
+    """
+    results = [schemas.InvoiceBatchResult(index=index) for index in range(len(invoices))]
+    valid = []
+    for index, invoice in enumerate(invoices):
+        results[index].error = invoice_row_error(invoice, username)
+        if results[index].error is None:
+            valid.append(index)
+    if not valid:
+        return results
+
+    customer_ids = await get_user_ids_by_phone(
+        db,
+        {
+            phone
+            for index in valid
+            if (phone := customer_phone(invoices[index]))
+        },
+    )
+    invoice_numbers = await generate_invoice_numbers(business_id, len(valid))
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start : start + chunk_size]
+        numbers = invoice_numbers[start : start + chunk_size]
+        invoice_rows, item_rows = [], []
+        customer_deltas: dict[int, list] = {}
+        business_delta = [0, 0.0]
+        rollups: dict[tuple, list] = {}
+        for index, invoice_number in zip(chunk, numbers):
+            invoice = invoices[index]
+            customer_id = customer_ids.get(customer_phone(invoice))
+            line_items, total_amount = line_item_values(invoice.line_items)
+            values = invoice_values(
+                invoice, business_id, customer_id, invoice_number, total_amount
+            )
+            invoice_rows.append(values)
+            item_rows.append(line_items)
+            add_rollup_delta(
+                rollups, business_id, values["created_at"], invoice.status, 1, total_amount
+            )
+
+            paid = _paid_amount(invoice.status, total_amount)
+            business_delta[0] += 1
+            business_delta[1] += paid
+            if customer_id:
+                delta = customer_deltas.setdefault(customer_id, [0, 0.0])
+                delta[0] += 1
+                delta[1] += paid
+
+        try:
+            invoice_ids = (
+                await db.scalars(
+                    insert(models.Invoice.__table__).returning(
+                        models.Invoice.__table__.c.id, sort_by_parameter_order=True
+                    ),
+                    invoice_rows,
+                )
+            ).all()
+            line_item_rows = [
+                {**row, "invoice_id": invoice_id}
+                for invoice_id, rows in zip(invoice_ids, item_rows)
+                for row in rows
+            ]
+            if line_item_rows:
+                await db.execute(insert(models.LineItem.__table__), line_item_rows)
+            await refresh_search_vectors(db, models.Invoice.id.in_(invoice_ids))
+            await update_invoice_stats(db, business_id, business_delta, customer_deltas)
+            await update_invoice_rollups(db, rollups)
+            if settings.sms_invoice_notifications:
+                _enqueue_invoice_sms(db, invoice_ids, invoice_rows, item_rows)
+            await db.commit()
+        except SQLAlchemyError as exc:
+            await db.rollback()
+            for index in chunk:
+                results[index].error = f"Batch insert failed: {exc.__class__.__name__}"
+            continue
+
+        for index, invoice_number in zip(chunk, numbers):
+            results[index].invoice_number = invoice_number
+
+    return results
+
+
+def _enqueue_invoice_sms(
+    db: AsyncSession, invoice_ids: list[int], invoice_rows: list[dict], item_rows: list[list[dict]]
+):
+    """Queue create_invoice's customer SMS for invoices inserted as rows."""
+    for invoice_id, values, line_items in zip(invoice_ids, invoice_rows, item_rows):
+        if not values["customer_phone"]:
+            continue
+        # transient objects, only read by format_invoice
+        invoice = models.Invoice(
+            id=invoice_id,
+            created_at=values["created_at"],
+            total_amount=values["total_amount"],
+            line_items=[models.LineItem(**row) for row in line_items],
+        )
+        enqueue_sms(db, values["customer_phone"], format_invoice(invoice), invoice_id=invoice_id)
+
+
+async def _lock_invoice_totals(db: AsyncSession, invoice_id: int):
+    """Lock the invoice row and return its (status, total_amount) as stored.
+
+    Stats deltas are computed from these values rather than from the
+    already-loaded object, so concurrent edits cannot double count.
+    """
+    row = await db.execute(
+        select(models.Invoice.status, models.Invoice.total_amount)
+        .where(models.Invoice.id == invoice_id)
+        .with_for_update()
+    )
+    return row.one()
+
+
+async def _apply_paid_delta(
+    db: AsyncSession, invoice: models.Invoice, invoices: int, paid: float
 ):
-    data = invoice_data.model_dump(exclude_unset=True)
+    # called on every write, also to bump the users' invoice versions
+    await update_invoice_stats(
+        db,
+        invoice.business_id,
+        (invoices, paid),
+        {invoice.customer_id: (invoices, paid)} if invoice.customer_id else {},
+    )
 
-    if invoice_data.line_items:
-        invoice.line_items.clear()
-
-        total_amount = 0
-        for item in invoice_data.line_items:
-            transaction_value = item.unit_price * item.quantity
-            total_amount += transaction_value
-            line_item = models.LineItem(
-                product_name=item.product_name,
-                unit_price=item.unit_price,
-                quantity=item.quantity,
-                transaction_value=transaction_value,
-                description=item.description,
-                type=item.type,
-            )
-            invoice.line_items.append(line_item)
 
-        invoice.total_amount = total_amount
+async def update_invoice(
+    db: AsyncSession, invoice: models.Invoice, invoice_data: schemas.InvoiceUpdate
+):
+    old_status, old_total = await _lock_invoice_totals(db, invoice.id)
+    data = invoice_data.model_dump(exclude_unset=True, exclude={"line_items"})
+
+    if invoice_data.line_items:
+        line_items, total_amount = line_item_values(invoice_data.line_items)
+        await db.execute(
+            delete(models.LineItem).where(models.LineItem.invoice_id == invoice.id)
+        )
+        await db.execute(
+            insert(models.LineItem.__table__),
+            [{**row, "invoice_id": invoice.id} for row in line_items],
+        )
+        # the total always follows the line items when they are replaced
+        data["total_amount"] = total_amount
 
     for field, value in data.items():
-        if field != "line_items":
-            setattr(invoice, field, value)
+        setattr(invoice, field, value)
+    # set explicitly: replacing only the line items leaves the row itself unchanged
+    invoice.updated_at = datetime.now()
+    # the search vector is computed from the row as stored
+    await db.flush()
+    await refresh_search_vectors(db, models.Invoice.id == invoice.id)
+
+    await _apply_paid_delta(
+        db,
+        invoice,
+        invoices=0,
+        paid=_paid_amount(invoice.status, invoice.total_amount)
+        - _paid_amount(old_status, old_total),
+    )
+    rollups = {}
+    add_rollup_delta(rollups, invoice.business_id, invoice.created_at, old_status, -1, -old_total)
+    add_rollup_delta(
+        rollups, invoice.business_id, invoice.created_at, invoice.status, 1, invoice.total_amount
+    )
+    await update_invoice_rollups(db, rollups)
 
-    db.commit()
-    db.refresh(invoice)
-    return invoice
+    await db.commit()
+    invalidate_invoice(invoice.invoice_number)
+    pdf.invalidate(invoice.id)
+    return await _get_invoice(db, invoice.id)
 
 
-def delete_invoice(db: Session, invoice: models.Invoice):
+async def delete_invoice(db: AsyncSession, invoice: models.Invoice):
     invoice_number = invoice.invoice_number
-    invoice.line_items.clear()
-    db.delete(invoice)
-    db.commit()
+    old_status, old_total = await _lock_invoice_totals(db, invoice.id)
+    await _apply_paid_delta(
+        db, invoice, invoices=-1, paid=-_paid_amount(old_status, old_total)
+    )
+    rollups = {}
+    add_rollup_delta(rollups, invoice.business_id, invoice.created_at, old_status, -1, -old_total)
+    await update_invoice_rollups(db, rollups)
+    await db.execute(
+        delete(models.LineItem).where(models.LineItem.invoice_id == invoice.id)
+    )
+    await db.execute(delete(models.Invoice).where(models.Invoice.id == invoice.id))
+    await db.commit()
+    invalidate_invoice(invoice_number)
+    pdf.invalidate(invoice.id)
     return {"invoice_number": invoice_number, "status": "deleted"}
 
 
-def update_customer_stats(db: Session, customer_id: int, invoice: models.Invoice):
-    customer_stats = (
-        db.query(models.UserStats)
-        .filter(models.UserStats.user_id == customer_id)
-        .first()
+async def get_user_stats(db: AsyncSession, user_id: int):
+    return await db.scalar(
+        select(models.UserStats).where(models.UserStats.user_id == user_id)
     )
-    if customer_stats:
-        customer_stats.total_invoices_received += 1
-        if invoice.status == "PAID":
-            customer_stats.total_amount_paid_out += invoice.total_amount
-    db.commit()
 
 
-def update_business_stats(db: Session, business_id: int, invoice: models.Invoice):
-    business_stats = (
-        db.query(models.UserStats)
-        .filter(models.UserStats.user_id == business_id)
-        .first()
+async def rebuild_user_stats(db: AsyncSession, user_ids: Optional[set[int]] = None):
+    """Recompute user_stats from invoices in set-based statements.
+
+    This is the reconciliation path for the incrementally maintained
+    counters. Pass ``user_ids`` to limit it to a few users. It does not
+    commit.
+    """
+    invoice = models.Invoice
+    paid_total = func.coalesce(
+        func.sum(invoice.total_amount).filter(invoice.status == models.InvoiceStatus.paid),
+        0.0,
+    )
+    sent = select(
+        invoice.business_id.label("user_id"),
+        func.count().label("invoices"),
+        paid_total.label("paid"),
+    ).group_by(invoice.business_id)
+    received = (
+        select(
+            invoice.customer_id.label("user_id"),
+            func.count().label("invoices"),
+            paid_total.label("paid"),
+        )
+        .where(invoice.customer_id.is_not(None))
+        .group_by(invoice.customer_id)
+    )
+    users = select(models.User.id)
+    if user_ids is not None:
+        sent = sent.where(invoice.business_id.in_(user_ids))
+        received = received.where(invoice.customer_id.in_(user_ids))
+        users = users.where(models.User.id.in_(user_ids))
+    sent = sent.subquery()
+    received = received.subquery()
+
+    # users created before their stats row existed
+    await db.execute(
+        pg_insert(models.UserStats)
+        .from_select(["user_id"], users)
+        .on_conflict_do_nothing(index_elements=[models.UserStats.user_id])
+    )
+
+    totals = (
+        select(
+            models.User.id.label("user_id"),
+            func.coalesce(sent.c.invoices, 0).label("invoices_sent"),
+            func.coalesce(sent.c.paid, 0.0).label("paid_in"),
+            func.coalesce(received.c.invoices, 0).label("invoices_received"),
+            func.coalesce(received.c.paid, 0.0).label("paid_out"),
+        )
+        .select_from(models.User)
+        .outerjoin(sent, sent.c.user_id == models.User.id)
+        .outerjoin(received, received.c.user_id == models.User.id)
+    )
+    if user_ids is not None:
+        totals = totals.where(models.User.id.in_(user_ids))
+    totals = totals.subquery()
+
+    stats = models.UserStats
+    await db.execute(
+        update(stats)
+        .where(stats.user_id == totals.c.user_id)
+        .values(
+            total_invoices_sent=totals.c.invoices_sent,
+            total_amount_paid_in=totals.c.paid_in,
+            total_invoices_received=totals.c.invoices_received,
+            total_amount_paid_out=totals.c.paid_out,
+        )
     )
-    if business_stats:
-        business_stats.total_invoices_sent += 1
-        if invoice.status == "PAID":
-            business_stats.total_amount_paid_in += invoice.total_amount
 
-    db.commit()
+
+def enqueue_sms(
+    db: AsyncSession, phone_number: str, message: str, invoice_id: Optional[int] = None
+):
+    """Queue an SMS in the caller's transaction; the dispatcher delivers it."""
+    db.add(
+        models.SmsOutbox(phone_number=phone_number, message=message, invoice_id=invoice_id)
+    )
+
+
+def _paid_amount(status, total_amount: float) -> float:
+    """The amount an invoice contributes to the paid totals."""
+    if models.InvoiceStatus(status) == models.InvoiceStatus.paid:
+        return total_amount
+    return 0.0
+
+
+async def update_customer_stats(
+    db: AsyncSession, customer_id: int, invoices: int = 0, paid: float = 0.0
+):
+    """Atomically add to a customer's received counters and bump their
+    invoice version; no read, no commit."""
+    await db.execute(
+        update(models.UserStats)
+        .where(models.UserStats.user_id == customer_id)
+        .values(
+            total_invoices_received=models.UserStats.total_invoices_received + invoices,
+            total_amount_paid_out=models.UserStats.total_amount_paid_out + paid,
+            invoices_version=models.UserStats.invoices_version + 1,
+            invoices_updated_at=datetime.now(),
+        )
+    )
+
+
+async def bump_invoice_versions(db: AsyncSession, user_ids: set[int], now: datetime):
+    """Bump the invoice version of many users in one UPDATE; no commit.
+
+    Rows are locked in user_id order first, so concurrent callers with
+    overlapping users queue up instead of deadlocking.
+    """
+    if not user_ids:
+        return
+    stats = models.UserStats
+    locked = (
+        select(stats.user_id)
+        .where(stats.user_id.in_(user_ids))
+        .order_by(stats.user_id)
+        .with_for_update()
+    )
+    await db.execute(
+        update(models.UserStats)
+        .where(models.UserStats.user_id.in_(locked))
+        .values(
+            invoices_version=models.UserStats.invoices_version + 1,
+            invoices_updated_at=now,
+        )
+    )
+
+
+async def update_business_stats(
+    db: AsyncSession, business_id: int, invoices: int = 0, paid: float = 0.0
+):
+    """Atomically add to a business's sent counters and bump their invoice
+    version; no read, no commit."""
+    await db.execute(
+        update(models.UserStats)
+        .where(models.UserStats.user_id == business_id)
+        .values(
+            total_invoices_sent=models.UserStats.total_invoices_sent + invoices,
+            total_amount_paid_in=models.UserStats.total_amount_paid_in + paid,
+            invoices_version=models.UserStats.invoices_version + 1,
+            invoices_updated_at=datetime.now(),
+        )
+    )
+
+
+async def update_invoice_stats(
+    db: AsyncSession,
+    business_id: int,
+    business_delta: tuple[int, float],
+    customer_deltas: dict[int, tuple[int, float]],
+):
+    """Add (invoices, paid) deltas to a business and its customers; no commit.
+
+    The UPDATEs go in user_id order, as in bump_invoice_versions, so two
+    writers whose business and customer are swapped lock the same
+    user_stats rows in the same order instead of deadlocking.
+    """
+    updates = [(business_id, update_business_stats, business_delta)] + [
+        (customer_id, update_customer_stats, delta)
+        for customer_id, delta in customer_deltas.items()
+    ]
+    for user_id, apply, (invoices, paid) in sorted(updates, key=lambda update: update[0]):
+        await apply(db, user_id, invoices=invoices, paid=paid)
+
+
+def add_rollup_delta(
+    rollups: dict, business_id: int, created_at: datetime, status, invoices: int, amount: float
+):
+    """Accumulate an invoice count and amount change for one rollup row."""
+    delta = rollups.setdefault(
+        (business_id, created_at.date(), models.InvoiceStatus(status)), [0, 0.0]
+    )
+    delta[0] += invoices
+    delta[1] += amount
+
+
+async def update_invoice_rollups(db: AsyncSession, rollups: dict):
+    """Add accumulated deltas to invoice_daily_rollups in one upsert; no commit.
+
+    Rows are written in key order so concurrent writers to the same
+    business take the row locks in the same order.
+    """
+    rows = [
+        {
+            "business_id": business_id,
+            "day": day,
+            "status": status,
+            "invoice_count": invoices,
+            "total_amount": amount,
+        }
+        for (business_id, day, status), (invoices, amount) in sorted(
+            rollups.items(), key=lambda item: (item[0][0], item[0][1], item[0][2].value)
+        )
+        if invoices or amount
+    ]
+    if not rows:
+        return
+    table = models.InvoiceDailyRollup.__table__
+    stmt = pg_insert(table)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.business_id, table.c.day, table.c.status],
+            set_={
+                "invoice_count": table.c.invoice_count + stmt.excluded.invoice_count,
+                "total_amount": table.c.total_amount + stmt.excluded.total_amount,
+            },
+        ),
+        rows,
+    )
+
+
+async def rebuild_invoice_rollups(db: AsyncSession, business_ids: Optional[set[int]] = None):
+    """Recompute invoice_daily_rollups from invoices; it does not commit.
+
+    The reconciliation path for the incrementally maintained rollups, like
+    rebuild_user_stats is for user_stats.
+    """
+    invoice = models.Invoice
+    rollup = models.InvoiceDailyRollup
+    day = func.cast(invoice.created_at, Date)
+    totals = select(
+        invoice.business_id,
+        day,
+        invoice.status,
+        func.count(),
+        func.sum(invoice.total_amount),
+    ).group_by(invoice.business_id, day, invoice.status)
+    clear = delete(rollup)
+    if business_ids is not None:
+        totals = totals.where(invoice.business_id.in_(business_ids))
+        clear = clear.where(rollup.business_id.in_(business_ids))
+
+    await db.execute(clear)
+    await db.execute(
+        insert(rollup).from_select(
+            ["business_id", "day", "status", "invoice_count", "total_amount"], totals
+        )
+    )
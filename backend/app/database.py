@@ -1,24 +1,110 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from .config import settings
+from .pool_metrics import TimedAsyncQueuePool
 
 
 DATABASE_URL = (
     f"postgresql://{settings.database_user}:{settings.database_password}"
     f"@{settings.database_host}:{settings.database_port}/{settings.database_name}"
 )
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
 
-engine = create_engine(DATABASE_URL, echo=False)
+def pool_limits(workers: int) -> tuple[int, int]:
+    """pool_size and max_overflow of each worker's API engine.
+
+    Without DB_MAX_CONNECTIONS these are DB_POOL_SIZE and DB_MAX_OVERFLOW.
+    With it, every worker gets an equal share of the budget. The invoice
+    counter pool is taken out of the share first. The rest is the API
+    pool, up to DB_POOL_SIZE kept open and the remainder as overflow.
+    """
+    if not settings.db_max_connections:
+        return settings.db_pool_size, settings.db_max_overflow
+    share = settings.db_max_connections // workers - settings.db_counter_pool_size
+    if share < 1:
+        raise RuntimeError(
+            f"DB_MAX_CONNECTIONS={settings.db_max_connections} is too low for {workers} "
+            f"workers; each needs at least {settings.db_counter_pool_size + 1}"
+        )
+    pool_size = min(settings.db_pool_size, share)
+    return pool_size, share - pool_size
+
+
+# app/server.py sets SERVER_WORKERS for its workers; a bare uvicorn is one process
+POOL_SIZE, MAX_OVERFLOW = pool_limits(max(settings.server_workers, 1))
+
+POOL_OPTIONS = dict(
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+)
+
+
+def _statement_timeout_args(async_driver: bool) -> dict:
+    """Driver connect args applying db_statement_timeout_ms to every session."""
+    if not settings.db_statement_timeout_ms:
+        return {}
+    timeout = str(settings.db_statement_timeout_ms)
+    if async_driver:
+        return {"server_settings": {"statement_timeout": timeout}}
+    return {"options": f"-c statement_timeout={timeout}"}
+
+
+# Sync engine, for Alembic and standalone scripts
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    connect_args=_statement_timeout_args(async_driver=False),
+    **POOL_OPTIONS,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine, used by the API so queries don't block the event loop.
+# expire_on_commit is off because expired attributes cannot be lazy loaded
+# once a response is being serialized outside the session.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    poolclass=TimedAsyncQueuePool,
+    connect_args=_statement_timeout_args(async_driver=True),
+    **POOL_OPTIONS,
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+# Small separate pool for invoice number reservations. They commit on their
+# own connection while a request still holds one from async_engine, so
+# sharing that pool could deadlock once every request is waiting for a
+# second connection.
+counter_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    connect_args=_statement_timeout_args(async_driver=True),
+    pool_size=settings.db_counter_pool_size,
+    max_overflow=0,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+)
+
 Base = declarative_base()
 
-# Dependency for FastAPI routes
+# Dependency for sync code paths
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# Dependency for FastAPI routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,19 +1,76 @@
+import asyncio
+from collections import defaultdict, deque
+
 from .utils import slugify_name
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models
+from .config import settings
+from .database import counter_engine
 
-def generate_unique_username(db: Session, full_name: str) -> str:
+async def generate_unique_username(db: AsyncSession, full_name: str) -> str:
     """Generate a unique username based on the user's full name."""
     base = slugify_name(full_name)
     username = base
     counter = 1
 
-    while db.query(models.User).filter(models.User.username == username).first():
+    while await db.scalar(select(models.User.id).where(models.User.username == username)):
         username = f"{base}{counter}"
         counter += 1
 
     return username
 
-def generate_invoice_number(db: Session, business_id: int) -> str:
-    count = db.query(models.UserStats).filter(models.UserStats.user_id == business_id).first().total_invoices_sent
-    return f"INV-{business_id}-{count + 1:05d}"
\ No newline at end of file
+
+def format_invoice_number(business_id: int, number: int) -> str:
+    return f"INV-{business_id}-{number:05d}"
+
+
+class InvoiceNumberAllocator:
+    """Hands out per-business invoice numbers from the invoice_counters table.
+
+    Each reservation is a single atomic upsert ... RETURNING on its own
+    connection from counter_engine, committed straight away. Concurrent writers never see the
+    same value, and the counter row is locked only for that one statement,
+    not for the whole invoice transaction. With a block size above 1,
+    ranges are reserved up front and served from memory. Numbers still
+    unused when a worker exits, or used by a rolled back invoice, become
+    gaps.
+    """
+
+    def __init__(self, block_size: int = 1):
+        self.block_size = max(block_size, 1)
+        self._reserved: dict[int, deque[int]] = defaultdict(deque)
+        self._locks: dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def _reserve(self, business_id: int, size: int) -> int:
+        stmt = (
+            insert(models.InvoiceCounter)
+            .values(business_id=business_id, last_number=size)
+            .on_conflict_do_update(
+                index_elements=[models.InvoiceCounter.business_id],
+                set_={"last_number": models.InvoiceCounter.last_number + size},
+            )
+            .returning(models.InvoiceCounter.last_number)
+        )
+        async with counter_engine.begin() as conn:
+            return (await conn.execute(stmt)).scalar_one()
+
+    async def allocate(self, business_id: int, count: int = 1) -> list[str]:
+        async with self._locks[business_id]:
+            reserved = self._reserved[business_id]
+            if len(reserved) < count:
+                size = max(count - len(reserved), self.block_size)
+                last = await self._reserve(business_id, size)
+                reserved.extend(range(last - size + 1, last + 1))
+            numbers = [reserved.popleft() for _ in range(count)]
+        return [format_invoice_number(business_id, number) for number in numbers]
+
+
+invoice_number_allocator = InvoiceNumberAllocator(
+    block_size=settings.invoice_number_block_size
+)
+
+
+async def generate_invoice_numbers(business_id: int, count: int = 1) -> list[str]:
+    return await invoice_number_allocator.allocate(business_id, count)
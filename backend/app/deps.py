@@ -1,23 +1,26 @@
+import secrets
 from typing import Annotated
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import User
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.auth_cache import auth_user_cache
+from app.config import settings
 from app.security import SECRET_KEY, ALGORITHM
-from app.schemas import TokenData
+from app.schemas import AuthUser, TokenData
 
 import jwt
 from jwt.exceptions import InvalidTokenError
 from app.crud import get_user, get_user_by_phone
-from app.security import verify_password
+from app.security import verify_and_update_password
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/token")
 
 
 async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: AsyncSession = Depends(get_async_db),
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -33,24 +36,43 @@ async def get_current_user(
     except InvalidTokenError:
         raise credentials_exception
     assert token_data.username is not None
-    user = get_user(db, username=token_data.username)
+    cached = auth_user_cache.get(token_data.username)
+    if cached is not None:
+        return cached
+    user = await get_user(db, username=token_data.username)
     if user is None:
         raise credentials_exception
-    return user
+    auth_user = AuthUser.model_validate(user)
+    auth_user_cache.set(token_data.username, auth_user)
+    return auth_user
 
 
 async def get_current_active_user(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
 ):
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
-def authenticate_user(db: Session, phone_number: str, password: str):
-    user = get_user_by_phone(db, phone_number)
+async def authenticate_user(db: AsyncSession, phone_number: str, password: str):
+    user = await get_user_by_phone(db, phone_number)
     if not user:
         return False
-    if not verify_password(password, user.password):
+    verified, new_hash = await verify_and_update_password(password, user.password)
+    if not verified:
         return False
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
     return user
+
+
+async def require_internal_token(
+    x_internal_token: Annotated[str | None, Header()] = None,
+):
+    # fail closed: without a configured token the internal routes do not exist
+    if not settings.internal_token or not x_internal_token or not secrets.compare_digest(
+        x_internal_token.encode(), settings.internal_token.encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
@@ -0,0 +1,139 @@
+"""Streaming invoice exports.
+
+Invoices are flattened to one row per line item; an invoice without line
+items still gets one row, with the line item columns empty. Rows come
+from a server-side cursor in ``yield_per`` sized batches and are encoded
+and optionally gzipped as they arrive, so memory does not grow with the
+size of the export.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from sqlalchemy import select
+
+from . import models, schemas
+from .config import settings
+from .database import AsyncSessionLocal
+
+
+EXPORT_COLUMNS = (
+    ("invoice_number", models.Invoice.invoice_number),
+    ("created_at", models.Invoice.created_at),
+    ("due_date", models.Invoice.due_date),
+    ("status", models.Invoice.status),
+    ("business_name", models.Invoice.business_name),
+    ("customer_name", models.Invoice.customer_name),
+    ("customer_phone", models.Invoice.customer_phone),
+    ("total_amount", models.Invoice.total_amount),
+    ("notes", models.Invoice.notes),
+    ("product_name", models.LineItem.product_name),
+    ("description", models.LineItem.description),
+    ("type", models.LineItem.type),
+    ("unit_price", models.LineItem.unit_price),
+    ("quantity", models.LineItem.quantity),
+    ("transaction_value", models.LineItem.transaction_value),
+)
+FIELD_NAMES = [name for name, _ in EXPORT_COLUMNS]
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _export_query(business_id: int, params: schemas.InvoiceExportParams):
+    query = (
+        select(*(column for _, column in EXPORT_COLUMNS))
+        .select_from(models.Invoice)
+        .outerjoin(models.LineItem, models.LineItem.invoice_id == models.Invoice.id)
+        .where(models.Invoice.business_id == business_id)
+    )
+    if params.status:
+        query = query.where(models.Invoice.status == models.InvoiceStatus(params.status))
+    if params.created_from:
+        query = query.where(models.Invoice.created_at >= params.created_from)
+    if params.created_to:
+        query = query.where(models.Invoice.created_at <= params.created_to)
+    # (business_id, created_at, id) index order, so rows stream without sorting the export first
+    return query.order_by(models.Invoice.created_at, models.Invoice.id, models.LineItem.id)
+
+
+def _enum_value(value):
+    return value.value if value is not None else None
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+# only these columns need converting to plain values; the rest pass through
+_CONVERTERS = {
+    "created_at": _isoformat,
+    "due_date": _isoformat,
+    "status": _enum_value,
+    "type": _enum_value,
+}
+_CONVERTED = [
+    (index, _CONVERTERS[name]) for index, name in enumerate(FIELD_NAMES) if name in _CONVERTERS
+]
+
+
+def _plain(row) -> list:
+    values = list(row)
+    for index, convert in _CONVERTED:
+        values[index] = convert(values[index])
+    return values
+
+
+async def _export_rows(business_id: int, params: schemas.InvoiceExportParams):
+    # A session of its own: the request's session is closed before a
+    # streaming response starts sending.
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            _export_query(business_id, params).execution_options(
+                yield_per=settings.export_yield_per
+            )
+        )
+        async for partition in result.partitions():
+            yield [_plain(row) for row in partition]
+
+
+def _encode_csv(rows: list, header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(FIELD_NAMES)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(rows: list, header: bool) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(FIELD_NAMES, row)), ensure_ascii=False) + "\n" for row in rows
+    ).encode()
+
+
+async def stream_export(business_id: int, params: schemas.InvoiceExportParams):
+    """Yield the encoded export in chunks of one cursor batch each."""
+    encode = _encode_csv if params.format == "csv" else _encode_ndjson
+    # wbits=31 writes a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(wbits=31) if params.gzip else None
+    header = True
+    async for rows in _export_rows(business_id, params):
+        chunk = encode(rows, header)
+        header = False
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if header:
+        # no rows at all, a CSV still gets its header
+        chunk = encode([], True)
+        yield compressor.compress(chunk) + compressor.flush() if compressor else chunk
+    elif compressor:
+        yield compressor.flush()
+
+
+def export_filename(username: str, params: schemas.InvoiceExportParams) -> str:
+    name = f"invoices-{username}-{datetime.now():%Y%m%d}.{params.format}"
+    return f"{name}.gz" if params.gzip else name
@@ -0,0 +1,337 @@
+"""Per-request timing: SQL, handler, serialization and bcrypt.
+
+A sampled request gets a RequestMetrics in a context variable. Engine
+cursor events add each statement's duration to it. InstrumentedRoute
+times the endpoint function. ``span`` times anything else, such as
+bcrypt. The middleware reads it when the response starts, for the
+Server-Timing header, and when the response ends, for a JSON log line
+and the histograms served at /metrics (only with X-Internal-Token).
+
+"serialize" is the time from the endpoint returning to the response
+starting: response model validation, JSON encoding and closing the
+request's dependencies. A request not sampled (REQUEST_METRICS_SAMPLE_RATE)
+costs one random() call.
+"""
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_STATEMENT_CHARS = 200
+
+
+@dataclass
+class RequestMetrics:
+    started: float
+    queries: int = 0
+    db_seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_statement: Optional[str] = None
+    handler_seconds: Optional[float] = None
+    handler_finished: Optional[float] = None
+    response_started: Optional[float] = None
+    spans: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def serialize_seconds(self) -> Optional[float]:
+        if self.handler_finished is None or self.response_started is None:
+            return None
+        return self.response_started - self.handler_finished
+
+    def server_timing(self) -> str:
+        queries = "1 query" if self.queries == 1 else f"{self.queries} queries"
+        entries = [f'db;dur={self.db_seconds * 1000:.1f};desc="{queries}"']
+        if self.handler_seconds is not None:
+            entries.append(f"handler;dur={self.handler_seconds * 1000:.1f}")
+        if self.serialize_seconds is not None:
+            entries.append(f"serialize;dur={self.serialize_seconds * 1000:.1f}")
+        entries += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items()]
+        entries.append(f"app;dur={(self.response_started - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Add the time spent in the block to the current request's ``name`` span."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.spans[name] = metrics.spans.get(name, 0.0) + time.perf_counter() - started
+
+
+# ---------- SQL ----------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._instrumentation_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = _current.get()
+    started = getattr(context, "_instrumentation_started", None)
+    if metrics is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    metrics.queries += 1
+    metrics.db_seconds += elapsed
+    if elapsed > metrics.slowest_seconds:
+        metrics.slowest_seconds = elapsed
+        metrics.slowest_statement = statement[:SLOWEST_STATEMENT_CHARS]
+
+
+def instrument_engines(*engines):
+    """Listen for cursor executions on sync engines (use ``.sync_engine`` for async ones)."""
+    for engine in engines:
+        if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------- handler ----------
+def _timed(call):
+    def finish(metrics: RequestMetrics, started: float):
+        metrics.handler_finished = time.perf_counter()
+        metrics.handler_seconds = metrics.handler_finished - started
+
+    if asyncio.iscoroutinefunction(call):
+        async def timed(**values):
+            metrics = _current.get()
+            if metrics is None:
+                return await call(**values)
+            started = time.perf_counter()
+            try:
+                return await call(**values)
+            finally:
+                finish(metrics, started)
+    else:
+        # sync endpoints run in a worker thread, which gets a copy of the context
+        def timed(**values):
+            metrics = _current.get()
+            if metrics is None:
+                return call(**values)
+            started = time.perf_counter()
+            try:
+                return call(**values)
+            finally:
+                finish(metrics, started)
+    return timed
+
+
+class InstrumentedRoute(APIRoute):
+    """APIRoute that records how long its endpoint function takes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the request handler looks up dependant.call on every request
+        self.dependant.call = _timed(self.dependant.call)
+
+
+# ---------- Prometheus ----------
+def _label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_label_value(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple, labels: tuple = ("method", "route")):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.label_names = labels
+        # label values -> [count per bucket..., +Inf count, sum]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.series: dict[tuple, int] = {}
+
+    def inc(self, labels: tuple):
+        self.series[labels] = self.series.get(labels, 0) + 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERIES = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+class RequestMetricsRegistry:
+    """Histograms of sampled requests by method and route template."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter(
+            "http_requests_sampled_total", "Sampled requests.", ("method", "route", "status")
+        )
+        self.histograms = {
+            "duration": Histogram(
+                "http_request_duration_seconds", "Time to the end of the response.", SECONDS
+            ),
+            "handler": Histogram(
+                "http_request_handler_seconds", "Time in the endpoint function.", SECONDS
+            ),
+            "serialize": Histogram(
+                "http_request_serialize_seconds",
+                "Time from the endpoint returning to the response starting.",
+                SECONDS,
+            ),
+            "db": Histogram(
+                "http_request_db_seconds", "Time executing SQL statements.", SECONDS
+            ),
+            "queries": Histogram(
+                "http_request_queries", "SQL statements executed.", QUERIES
+            ),
+            "bcrypt": Histogram(
+                "http_request_bcrypt_seconds", "Time hashing or verifying passwords.", SECONDS
+            ),
+        }
+
+    def observe(self, method: str, route: str, status: int, metrics: RequestMetrics, duration: float):
+        labels = (method, route)
+        values = {
+            "duration": duration,
+            "handler": metrics.handler_seconds,
+            "serialize": metrics.serialize_seconds,
+            "db": metrics.db_seconds,
+            "queries": metrics.queries,
+            "bcrypt": metrics.spans.get("bcrypt"),
+        }
+        with self._lock:
+            self.requests.inc((method, route, status))
+            for name, value in values.items():
+                if value is not None:
+                    self.histograms[name].observe(labels, value)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_request_sample_rate Share of requests that are measured.",
+            "# TYPE http_request_sample_rate gauge",
+            f"http_request_sample_rate {settings.request_metrics_sample_rate}",
+        ]
+        with self._lock:
+            lines += self.requests.render()
+            for histogram in self.histograms.values():
+                lines += histogram.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = RequestMetricsRegistry()
+
+
+# ---------- middleware ----------
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware, so the context variable it sets reaches the route."""
+
+    def __init__(self, app, sample_rate: Optional[float] = None):
+        self.app = app
+        self.sample_rate = (
+            settings.request_metrics_sample_rate if sample_rate is None else sample_rate
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics(started=time.perf_counter())
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                metrics.response_started = time.perf_counter()
+                if settings.server_timing_enabled:
+                    MutableHeaders(scope=message).append("Server-Timing", metrics.server_timing())
+            await send(message)
+
+        token = _current.set(metrics)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            duration = time.perf_counter() - metrics.started
+            # the router leaves the matched route in the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            registry.observe(scope["method"], route, status, metrics, duration)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    json.dumps(
+                        {
+                            "method": scope["method"],
+                            "route": route,
+                            "path": scope["path"],
+                            "status": status,
+                            "duration_ms": _ms(duration),
+                            "handler_ms": _ms(metrics.handler_seconds),
+                            "serialize_ms": _ms(metrics.serialize_seconds),
+                            "db_ms": _ms(metrics.db_seconds),
+                            "queries": metrics.queries,
+                            "slowest_query_ms": _ms(metrics.slowest_seconds),
+                            "slowest_query": metrics.slowest_statement,
+                            **{f"{name}_ms": _ms(seconds) for name, seconds in metrics.spans.items()},
+                        }
+                    )
+                )
@@ -0,0 +1,32 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from . import schemas
+from .cache import TTLCache
+from .config import settings
+
+
+@dataclass(frozen=True)
+class CachedInvoice:
+    """A serialized invoice plus what is needed to check access to it."""
+    id: int
+    business_id: int
+    customer_id: Optional[int]
+    updated_at: datetime
+    data: schemas.InvoiceOut
+
+    def visible_to(self, user_id: int) -> bool:
+        return user_id in (self.business_id, self.customer_id)
+
+
+# Recently opened invoices, keyed by invoice number. Entries are per
+# process: crud drops them on edit and delete, and other workers see the
+# change once their own entry expires.
+invoice_cache = TTLCache(
+    maxsize=settings.invoice_cache_size, ttl=settings.invoice_cache_ttl_seconds
+)
+
+
+def invalidate_invoice(invoice_number: str):
+    invoice_cache.pop(invoice_number)
@@ -0,0 +1,375 @@
+"""Bulk import of historical invoices.
+
+The upload uses the export format (see app/export.py): one row per line
+item, with the rows of an invoice next to each other. The file's
+invoice_number groups the rows and is reported back in errors. Imported
+invoices are given new numbers from the business's counter; the response
+maps each file invoice_number to the number it was imported as.
+
+The file is read row by row and validated an invoice at a time, a chunk
+of invoices per trip to a worker thread, so decompressing, decoding,
+validating and building COPY records for a large upload does not stall
+the event loop. Valid invoices
+are COPYed into temporary staging tables in chunks. At the end,
+one INSERT ... SELECT per table merges them into invoices and line_items.
+One UPDATE per table then adds their totals to user_stats and
+invoice_daily_rollups. The import is a single transaction. Invalid
+invoices are skipped and reported.
+"""
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from itertools import islice
+from typing import Iterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import literal_column, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, models, schemas
+from .config import settings
+from .db_utils import generate_invoice_numbers
+
+
+INVOICE_COLUMNS = (
+    "invoice_number",
+    "business_id",
+    "business_name",
+    "customer_id",
+    "customer_name",
+    "customer_phone",
+    "total_amount",
+    "created_at",
+    "updated_at",
+    "due_date",
+    "status",
+    "notes",
+)
+LINE_ITEM_COLUMNS = (
+    "invoice_number",
+    "product_name",
+    "unit_price",
+    "quantity",
+    "transaction_value",
+    "description",
+    "type",
+)
+
+# Staging tables copy their column types from the real tables, so COPY
+# applies the same types and enums
+_CREATE_STAGING = (
+    f"""
+    CREATE TEMP TABLE import_invoices ON COMMIT DROP AS
+    SELECT {", ".join(INVOICE_COLUMNS)} FROM invoices WITH NO DATA
+    """,
+    f"""
+    CREATE TEMP TABLE import_line_items ON COMMIT DROP AS
+    SELECT {", ".join(f"i.{c}" if c == "invoice_number" else f"l.{c}" for c in LINE_ITEM_COLUMNS)}
+    FROM line_items l JOIN invoices i ON i.id = l.invoice_id WITH NO DATA
+    """,
+)
+
+# (statement, names of its parameters)
+_MERGE = (
+    (f"""
+    INSERT INTO invoices ({", ".join(INVOICE_COLUMNS)})
+    SELECT {", ".join(INVOICE_COLUMNS)} FROM import_invoices
+    """, ()),
+    (f"""
+    INSERT INTO line_items (invoice_id, {", ".join(LINE_ITEM_COLUMNS[1:])})
+    SELECT i.id, {", ".join(f"s.{c}" for c in LINE_ITEM_COLUMNS[1:])}
+    FROM import_line_items s JOIN invoices i ON i.invoice_number = s.invoice_number
+    """, ()),
+    # the same additions crud makes per invoice, once per user
+    ("""
+    UPDATE user_stats SET
+        total_invoices_sent = total_invoices_sent + s.invoices,
+        total_amount_paid_in = total_amount_paid_in + s.paid,
+        invoices_version = invoices_version + 1,
+        invoices_updated_at = :now
+    FROM (
+        SELECT business_id AS user_id, count(*) AS invoices,
+            coalesce(sum(total_amount) FILTER (WHERE status = 'paid'), 0) AS paid
+        FROM import_invoices GROUP BY business_id
+    ) s
+    WHERE user_stats.user_id = s.user_id
+    """, ("now",)),
+    ("""
+    UPDATE user_stats SET
+        total_invoices_received = total_invoices_received + s.invoices,
+        total_amount_paid_out = total_amount_paid_out + s.paid,
+        invoices_version = invoices_version + 1,
+        invoices_updated_at = :now
+    FROM (
+        SELECT customer_id AS user_id, count(*) AS invoices,
+            coalesce(sum(total_amount) FILTER (WHERE status = 'paid'), 0) AS paid
+        FROM import_invoices WHERE customer_id IS NOT NULL GROUP BY customer_id
+    ) s
+    WHERE user_stats.user_id = s.user_id
+    """, ("now",)),
+    ("""
+    INSERT INTO invoice_daily_rollups (business_id, day, status, invoice_count, total_amount)
+    SELECT business_id, CAST(created_at AS DATE), status, count(*), sum(total_amount)
+    FROM import_invoices
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (business_id, day, status) DO UPDATE SET
+        invoice_count = invoice_daily_rollups.invoice_count + excluded.invoice_count,
+        total_amount = invoice_daily_rollups.total_amount + excluded.total_amount
+    """, ()),
+)
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _open_text(upload, filename: str) -> io.TextIOBase:
+    raw = upload
+    if filename.endswith(".gz"):
+        raw = gzip.GzipFile(fileobj=upload, mode="rb")
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+
+
+def read_rows(upload, filename: str) -> Iterator[tuple[int, dict]]:
+    """Yield (line number, row) pairs, with empty values as None."""
+    name = filename.lower()
+    stream = _open_text(upload, name)
+    base = name.removesuffix(".gz")
+    if base.endswith(".csv"):
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key: value or None for key, value in row.items()}
+    elif base.endswith((".ndjson", ".jsonl")):
+        for line_num, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise ImportFormatError(f"Line {line_num}: invalid JSON ({exc.msg})")
+            if not isinstance(row, dict):
+                raise ImportFormatError(f"Line {line_num}: expected a JSON object")
+            yield line_num, {key: value if value != "" else None for key, value in row.items()}
+    else:
+        raise ImportFormatError("Upload a .csv or .ndjson file, optionally gzipped")
+
+
+def group_invoices(rows: Iterator[tuple[int, dict]]) -> Iterator[tuple[int, list[dict]]]:
+    """Group consecutive rows sharing an invoice_number."""
+    current, first_line, group = None, None, []
+    for line_num, row in rows:
+        number = row.get("invoice_number")
+        if group and number == current:
+            group.append(row)
+            continue
+        if group:
+            yield first_line, group
+        current, first_line, group = number, line_num, [row]
+    if group:
+        yield first_line, group
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def parse_invoice(rows: list[dict], username: str) -> tuple[schemas.InvoiceCreate, datetime]:
+    """Validate one invoice's rows; raises ValueError with a readable message."""
+    head = rows[0]
+    line_items = [
+        {
+            "product_name": row.get("product_name"),
+            "unit_price": row.get("unit_price"),
+            "quantity": row.get("quantity"),
+            "description": row.get("description"),
+            "type": row.get("type"),
+        }
+        for row in rows
+        if row.get("product_name") is not None
+    ]
+    try:
+        invoice = schemas.InvoiceCreate.model_validate(
+            {
+                "username": username,
+                "business_name": head.get("business_name") or username,
+                "customer_name": head.get("customer_name") or "Anonymous Customer",
+                "customer_phone": head.get("customer_phone"),
+                "total_amount": head.get("total_amount") or 0,
+                "due_date": head.get("due_date"),
+                "status": head.get("status") or models.InvoiceStatus.sent.value,
+                "notes": head.get("notes"),
+                "line_items": line_items,
+            }
+        )
+    except ValidationError as exc:
+        raise ValueError(_validation_message(exc))
+
+    created_at = head.get("created_at")
+    try:
+        created_at = datetime.fromisoformat(created_at) if created_at else datetime.now()
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid created_at '{created_at}'")
+    return invoice, created_at
+
+
+class InvoiceImporter:
+    """Stages validated invoices for one business and merges them on finish."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        business_id: int,
+        username: str,
+        chunk_size: int = settings.invoice_import_chunk_size,
+    ):
+        self.db = db
+        self.business_id = business_id
+        self.username = username
+        self.chunk_size = chunk_size
+        self.pending: list[tuple[str, schemas.InvoiceCreate, datetime]] = []
+        self.seen: set[Optional[str]] = set()
+        self.imported = 0
+        self.invoice_numbers: dict[str, str] = {}
+        self.errors: list[schemas.InvoiceImportError] = []
+        self._copy = None
+
+    async def _connection(self):
+        if self._copy is None:
+            for statement in _CREATE_STAGING:
+                await self.db.execute(text(statement))
+            connection = await self.db.connection()
+            raw = await connection.get_raw_connection()
+            self._copy = raw.driver_connection
+        return self._copy
+
+    def _parse(self, line_num: int, rows: list[dict]):
+        """(invoice_number, invoice, created_at), or None after recording its error."""
+        number = rows[0].get("invoice_number")
+        try:
+            if number is None:
+                raise ValueError("invoice_number is required")
+            if number in self.seen:
+                raise ValueError("Rows of an invoice must be consecutive")
+            self.seen.add(number)
+            invoice, created_at = parse_invoice(rows, self.username)
+            error = crud.invoice_row_error(invoice, self.username)
+            if error:
+                raise ValueError(error)
+        except ValueError as exc:
+            self.errors.append(
+                schemas.InvoiceImportError(row=line_num, invoice_number=number, error=str(exc))
+            )
+            return None
+        return number, invoice, created_at
+
+    def read_chunk(self, groups: Iterator[tuple[int, list[dict]]]) -> tuple[list, bool]:
+        """Read and validate up to chunk_size invoices; runs in a worker thread.
+
+        Returns the valid ones and whether the file is exhausted.
+        """
+        valid, read = [], 0
+        for line_num, rows in islice(groups, self.chunk_size):
+            read += 1
+            parsed = self._parse(line_num, rows)
+            if parsed:
+                valid.append(parsed)
+        return valid, read < self.chunk_size
+
+    async def add(self, invoices: list[tuple[str, schemas.InvoiceCreate, datetime]]):
+        self.pending.extend(invoices)
+        if len(self.pending) >= self.chunk_size:
+            await self.flush()
+
+    def _records(
+        self,
+        invoices: list[tuple[str, schemas.InvoiceCreate, datetime]],
+        customer_ids: dict[str, int],
+        numbers: list[str],
+    ) -> tuple[list[tuple], list[tuple]]:
+        """COPY records for the staging tables; runs in a worker thread."""
+        invoice_records, item_records = [], []
+        for (_, invoice, created_at), invoice_number in zip(invoices, numbers):
+            line_items, total_amount = crud.line_item_values(invoice.line_items)
+            values = crud.invoice_values(
+                invoice,
+                self.business_id,
+                customer_ids.get(crud.customer_phone(invoice)),
+                invoice_number,
+                total_amount if line_items else invoice.total_amount,
+            )
+            values["created_at"] = created_at
+            invoice_records.append(tuple(values[column] for column in INVOICE_COLUMNS))
+            for item in line_items:
+                item["invoice_number"] = invoice_number
+                item_records.append(tuple(item[column] for column in LINE_ITEM_COLUMNS))
+        return invoice_records, item_records
+
+    async def flush(self):
+        """COPY the pending invoices into the staging tables."""
+        if not self.pending:
+            return
+        connection = await self._connection()
+        customer_ids = await crud.get_user_ids_by_phone(
+            self.db,
+            {phone for _, invoice, _ in self.pending if (phone := crud.customer_phone(invoice))},
+        )
+        numbers = await generate_invoice_numbers(self.business_id, len(self.pending))
+        invoice_records, item_records = await asyncio.to_thread(
+            self._records, self.pending, customer_ids, numbers
+        )
+
+        await connection.copy_records_to_table(
+            "import_invoices", records=invoice_records, columns=INVOICE_COLUMNS
+        )
+        if item_records:
+            await connection.copy_records_to_table(
+                "import_line_items", records=item_records, columns=LINE_ITEM_COLUMNS
+            )
+        self.invoice_numbers.update(zip((number for number, _, _ in self.pending), numbers))
+        self.imported += len(self.pending)
+        self.pending = []
+
+    async def finish(self) -> schemas.InvoiceImportOut:
+        await self.flush()
+        if self.imported:
+            values = {"now": datetime.now()}
+            for statement, names in _MERGE:
+                await self.db.execute(text(statement), {name: values[name] for name in names})
+            await crud.refresh_search_vectors(
+                self.db,
+                models.Invoice.invoice_number.in_(
+                    select(literal_column("invoice_number")).select_from(
+                        table("import_invoices")
+                    )
+                ),
+            )
+            await self.db.commit()
+        return schemas.InvoiceImportOut(
+            imported=self.imported,
+            failed=len(self.errors),
+            errors=self.errors,
+            invoice_numbers=self.invoice_numbers,
+        )
+
+
+async def import_invoices(
+    db: AsyncSession, business_id: int, username: str, upload, filename: str
+) -> schemas.InvoiceImportOut:
+    importer = InvoiceImporter(db, business_id, username)
+    groups = group_invoices(read_rows(upload, filename))
+    try:
+        done = False
+        while not done:
+            # the database work stays on the event loop: COPY, merge and lookups
+            invoices, done = await asyncio.to_thread(importer.read_chunk, groups)
+            await importer.add(invoices)
+    except (UnicodeDecodeError, csv.Error, gzip.BadGzipFile, EOFError) as exc:
+        raise ImportFormatError(f"Unreadable file: {exc}")
+    return await importer.finish()
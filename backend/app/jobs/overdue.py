@@ -0,0 +1,137 @@
+"""Mark past-due invoices as overdue.
+
+Each chunk is one transaction. It locks up to ``chunk_size`` sent invoices
+whose due date has passed, using the partial index on due_date WHERE
+status = 'sent'. It flips them to overdue and applies what follows from
+that:
+- the rollups move from sent to overdue
+- the business's and customers' invoice versions are bumped
+- this process's cached copies are dropped
+- reminders are queued when OVERDUE_REMINDERS is on
+
+SKIP LOCKED lets several nodes sweep at once without taking the same
+rows or waiting on each other. Work is proportional to the number of
+newly overdue invoices, not to the size of the table.
+
+Runs every OVERDUE_SWEEP_INTERVAL_SECONDS inside the API process when
+OVERDUE_SWEEP_ENABLED is set, or once from cron:
+
+    python -m app.jobs.overdue
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from app import crud, models, pdf
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.invoice_cache import invalidate_invoice
+
+
+logger = logging.getLogger(__name__)
+
+
+def reminder_message(row) -> str:
+    return (
+        f"Reminder: invoice {row.invoice_number} from {row.business_name} "
+        f"for {row.total_amount}/- was due on {row.due_date:%d %b %Y}."
+    )
+
+
+async def sweep_chunk(db, now: datetime, chunk_size: int, reminders: bool) -> int:
+    invoice = models.Invoice
+    due = (
+        select(invoice.id)
+        .where(invoice.status == models.InvoiceStatus.sent, invoice.due_date < now)
+        .order_by(invoice.due_date)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+        .cte("due")
+    )
+    rows = (
+        await db.execute(
+            update(invoice.__table__)
+            .where(invoice.__table__.c.id.in_(select(due.c.id)))
+            .values(status=models.InvoiceStatus.overdue, updated_at=now)
+            .returning(
+                invoice.id,
+                invoice.business_id,
+                invoice.customer_id,
+                invoice.invoice_number,
+                invoice.business_name,
+                invoice.customer_phone,
+                invoice.total_amount,
+                invoice.created_at,
+                invoice.due_date,
+            )
+        )
+    ).all()
+    if not rows:
+        await db.commit()
+        return 0
+
+    rollups = {}
+    users = set()
+    for row in rows:
+        crud.add_rollup_delta(
+            rollups, row.business_id, row.created_at,
+            models.InvoiceStatus.sent, -1, -row.total_amount,
+        )
+        crud.add_rollup_delta(
+            rollups, row.business_id, row.created_at,
+            models.InvoiceStatus.overdue, 1, row.total_amount,
+        )
+        users.add(row.business_id)
+        if row.customer_id:
+            users.add(row.customer_id)
+        if reminders and row.customer_phone:
+            crud.enqueue_sms(db, row.customer_phone, reminder_message(row), invoice_id=row.id)
+    # user_stats before rollups, the lock order every crud writer uses;
+    # overdue changes no paid totals, only what the users' lists show
+    await crud.bump_invoice_versions(db, users, now)
+    await crud.update_invoice_rollups(db, rollups)
+    await db.commit()
+
+    for row in rows:
+        invalidate_invoice(row.invoice_number)
+        pdf.invalidate(row.id)
+    return len(rows)
+
+
+async def sweep_overdue(
+    session_factory=AsyncSessionLocal,
+    chunk_size: int = settings.overdue_chunk_size,
+    reminders: bool = settings.overdue_reminders,
+) -> int:
+    """Mark every currently past-due sent invoice overdue; returns how many."""
+    now = datetime.now()
+    total = 0
+    async with session_factory() as db:
+        while True:
+            swept = await sweep_chunk(db, now, chunk_size, reminders)
+            total += swept
+            if swept < chunk_size:
+                break
+    if total:
+        logger.info("Marked %d invoices overdue", total)
+    return total
+
+
+async def run(stop: asyncio.Event, interval: float = settings.overdue_sweep_interval_seconds):
+    """Sweep every ``interval`` seconds until ``stop`` is set."""
+    while not stop.is_set():
+        try:
+            await sweep_overdue()
+        except Exception:
+            logger.exception("Overdue sweep failed")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(sweep_overdue())
@@ -0,0 +1,29 @@
+"""Rebuild user_stats from the invoices table.
+
+The counters are maintained incrementally by crud on every invoice write;
+run this after bulk data fixes, or on a schedule to correct any drift:
+
+    python -m app.jobs.reconcile_stats
+"""
+import asyncio
+import logging
+import time
+
+from app import crud
+from app.database import AsyncSessionLocal
+
+
+logger = logging.getLogger(__name__)
+
+
+async def reconcile_stats():
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await crud.rebuild_user_stats(db)
+        await db.commit()
+    logger.info("Rebuilt user_stats in %.2fs", time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(reconcile_stats())
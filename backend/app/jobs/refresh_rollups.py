@@ -0,0 +1,29 @@
+"""Rebuild invoice_daily_rollups from the invoices table.
+
+The rollups are maintained incrementally by crud on every invoice write;
+run this after bulk data fixes, or on a schedule to correct any drift:
+
+    python -m app.jobs.refresh_rollups
+"""
+import asyncio
+import logging
+import time
+
+from app import crud
+from app.database import AsyncSessionLocal
+
+
+logger = logging.getLogger(__name__)
+
+
+async def refresh_rollups():
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await crud.rebuild_invoice_rollups(db)
+        await db.commit()
+    logger.info("Rebuilt invoice_daily_rollups in %.2fs", time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(refresh_rollups())
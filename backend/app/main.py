@@ -1,12 +1,38 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from app import models
-from .database import engine
-from .routers import users, invoices
+from app import pdf
+from .config import settings
+from .database import async_engine, counter_engine, engine
+from .instrumentation import InstrumentationMiddleware, InstrumentedRoute, instrument_engines
+from .routers import users, invoices, analytics, internal
 from fastapi.middleware.cors import CORSMiddleware
 
-models.Base.metadata.create_all(bind=engine)
+# The schema is managed by Alembic (alembic upgrade head), not at import,
+# so workers boot without touching the database.
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background = []
+    stop = asyncio.Event()
+    if settings.sms_worker_enabled:
+        from .notifications import SmsDispatcher
+
+        background.append(asyncio.create_task(SmsDispatcher().run(stop)))
+    if settings.overdue_sweep_enabled:
+        from .jobs import overdue
+
+        background.append(asyncio.create_task(overdue.run(stop)))
+    yield
+    stop.set()
+    await asyncio.gather(*background, return_exceptions=True)
+    pdf.shutdown()
+
 
-app = FastAPI(title="SME Invoicing API",root_path="/invoices-app")
+app = FastAPI(title="SME Invoicing API",root_path="/invoices-app", lifespan=lifespan)
+app.router.route_class = InstrumentedRoute
 origins = [
     "http://localhost:5173",  # Vite/React dev server
     "http://127.0.0.1:5173",
@@ -19,11 +45,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],            # allow all HTTP methods (GET, POST, PUT, DELETE...)
     allow_headers=["*"],            # allow all headers
+    # pagination cursor and validators for invoice lists
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
+# outermost, so its timings cover the other middleware too
+app.add_middleware(InstrumentationMiddleware)
+instrument_engines(engine, async_engine.sync_engine, counter_engine.sync_engine)
 
 
 app.include_router(users.router)
 app.include_router(invoices.router)
+app.include_router(analytics.router)
+app.include_router(internal.router)
+app.include_router(internal.metrics_router)
 
 @app.get("/")
 def root():
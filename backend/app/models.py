@@ -1,7 +1,8 @@
-from sqlalchemy import Boolean, Integer, String, ForeignKey, DateTime, Float, Enum
+from sqlalchemy import Boolean, Integer, String, ForeignKey, Date, DateTime, Float, Enum, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship, mapped_column, Mapped
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 from .database import Base
 import enum
 
@@ -26,12 +27,14 @@ class User(Base):
 class UserStats(Base):
     __tablename__ = "user_stats"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False, unique=True, index=True)
     total_invoices_sent: Mapped[int] = mapped_column(Integer, default=0)
     total_invoices_received: Mapped[int] = mapped_column(Integer, default=0)
     total_amount_paid_in: Mapped[float] = mapped_column(Float, default=0.0)
     total_amount_paid_out: Mapped[float] = mapped_column(Float, default=0.0)
-    
+    # bumped by every write to an invoice the user sent or received; list ETags
+    invoices_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    invoices_updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     # relationships
     user = relationship("User", back_populates="user_stats")
@@ -56,15 +59,49 @@ class Invoice(Base):
     business_name: Mapped[str] = mapped_column(String, nullable=False)
     total_amount: Mapped[float] = mapped_column(Float, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
     due_date: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     status: Mapped[InvoiceStatus] = mapped_column(Enum(InvoiceStatus), default=InvoiceStatus.sent, nullable=False)
     notes: Mapped[str] = mapped_column(String, default="")
+    # maintained by crud.refresh_search_vectors; deferred so reads never load it
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, nullable=True, deferred=True)
 
     # relationships
     business = relationship("User", foreign_keys=[business_id], back_populates="invoices_sent")
     customer = relationship("User", foreign_keys=[customer_id], back_populates="invoices_received")
     line_items = relationship("LineItem", back_populates="invoice", cascade="all, delete-orphan")
 
+
+# listing indexes, matching the (created_at, id) keyset order used by crud
+Index("ix_invoices_business_id_created_at", Invoice.business_id, Invoice.created_at.desc(), Invoice.id.desc())
+Index("ix_invoices_customer_id_created_at", Invoice.customer_id, Invoice.created_at.desc(), Invoice.id.desc())
+# sent invoices by due date, for the overdue sweep (see app/jobs/overdue.py)
+Index("ix_invoices_sent_due_date", Invoice.due_date, postgresql_where=Invoice.status == InvoiceStatus.sent)
+# search (see crud.search_invoices)
+Index("ix_invoices_search_vector", Invoice.search_vector, postgresql_using="gin")
+Index("ix_invoices_customer_name_trgm", Invoice.customer_name, postgresql_using="gin", postgresql_ops={"customer_name": "gin_trgm_ops"})
+Index("ix_invoices_customer_phone_trgm", Invoice.customer_phone, postgresql_using="gin", postgresql_ops={"customer_phone": "gin_trgm_ops"})
+
+class InvoiceCounter(Base):
+    """Last invoice number handed out per business (see db_utils)."""
+    __tablename__ = "invoice_counters"
+
+    business_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), primary_key=True)
+    last_number: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class InvoiceDailyRollup(Base):
+    """Per business, day and status invoice totals, kept current by crud
+    and read by the analytics endpoints (see app/analytics.py)."""
+    __tablename__ = "invoice_daily_rollups"
+
+    business_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    status: Mapped[InvoiceStatus] = mapped_column(Enum(InvoiceStatus), primary_key=True)
+    invoice_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_amount: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+
+
 class LineItemTypeEnum(enum.Enum):
     product = "product"
     service = "service"
@@ -73,7 +110,7 @@ class LineItem(Base):
     __tablename__ = "line_items"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    invoice_id: Mapped[int] = mapped_column(Integer, ForeignKey("invoices.id"), nullable=False)
+    invoice_id: Mapped[int] = mapped_column(Integer, ForeignKey("invoices.id"), nullable=False, index=True)
     product_name: Mapped[str] = mapped_column(String, nullable=False)
     unit_price: Mapped[float] = mapped_column(Float, nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -82,4 +119,33 @@ class LineItem(Base):
     transaction_value: Mapped[float] = mapped_column(Float, nullable=False)
 
     # relationships
-    invoice = relationship("Invoice", back_populates="line_items")
\ No newline at end of file
+    invoice = relationship("Invoice", back_populates="line_items")
+
+
+class SmsStatus(enum.Enum):
+    pending = "pending"
+    sent = "sent"
+    failed = "failed"
+
+
+class SmsOutbox(Base):
+    """Outgoing SMS, written in the same transaction as the change that
+    triggers it and delivered by notifications.SmsDispatcher."""
+    __tablename__ = "sms_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    invoice_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("invoices.id", ondelete="SET NULL"), nullable=True)
+    phone_number: Mapped[str] = mapped_column(String, nullable=False)
+    message: Mapped[str] = mapped_column(String, nullable=False)
+    status: Mapped[SmsStatus] = mapped_column(Enum(SmsStatus), default=SmsStatus.pending, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    provider_message_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    provider_status: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+# the dispatcher only ever scans pending rows that are due
+Index("ix_sms_outbox_pending_next_attempt_at", SmsOutbox.next_attempt_at, postgresql_where=SmsOutbox.status == SmsStatus.pending)
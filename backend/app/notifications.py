@@ -0,0 +1,277 @@
+"""SMS delivery through the sms_outbox table.
+
+Request handlers only insert outbox rows (see crud.enqueue_sms), in the
+same transaction as the change they announce. SmsDispatcher claims due
+rows, groups identical messages into multi-recipient sends, and records
+each recipient's outcome. Failures are retried with exponential backoff.
+
+Run the worker standalone with ``python -m app.notifications``, or set
+SMS_WORKER_ENABLED to run it inside the API process.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Protocol
+
+from sqlalchemy import bindparam, select, update
+
+from . import models
+from .atalking import get_sms_service
+from .config import settings
+from .database import AsyncSessionLocal
+from .utils import to_international_phone
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SmsDelivery:
+    """Provider outcome for one recipient."""
+    success: bool
+    message_id: str | None = None
+    status: str | None = None
+    retryable: bool = True
+
+
+class SmsTransport(Protocol):
+    def send(self, message: str, recipients: list[str]) -> dict[str, SmsDelivery]:
+        """Send one message to many recipients, keyed by international number."""
+        ...
+
+
+class AfricasTalkingTransport:
+    # processed, sent, queued
+    SUCCESS_CODES = {100, 101, 102}
+    # risk hold, insufficient balance and gateway errors can clear up
+    RETRYABLE_CODES = {401, 405, 500, 501, 502}
+
+    def send(self, message: str, recipients: list[str]) -> dict[str, SmsDelivery]:
+        response = get_sms_service().send(message, recipients)
+        deliveries = {}
+        for recipient in response["SMSMessageData"]["Recipients"]:
+            code = recipient.get("statusCode")
+            deliveries[recipient["number"]] = SmsDelivery(
+                success=code in self.SUCCESS_CODES,
+                message_id=recipient.get("messageId"),
+                status=recipient.get("status"),
+                retryable=code in self.RETRYABLE_CODES,
+            )
+        return deliveries
+
+
+class FakeTransport:
+    """Records sends in memory; numbers in ``fail_numbers`` are rejected."""
+
+    def __init__(self, fail_numbers: set[str] | None = None, retryable: bool = True):
+        self.fail_numbers = fail_numbers or set()
+        self.retryable = retryable
+        self.sent: list[tuple[str, list[str]]] = []
+
+    def send(self, message: str, recipients: list[str]) -> dict[str, SmsDelivery]:
+        self.sent.append((message, list(recipients)))
+        return {
+            number: SmsDelivery(
+                success=number not in self.fail_numbers,
+                message_id=f"fake-{len(self.sent)}-{index}",
+                status="Failed" if number in self.fail_numbers else "Success",
+                retryable=self.retryable,
+            )
+            for index, number in enumerate(recipients)
+        }
+
+
+def get_transport() -> SmsTransport:
+    if settings.sms_transport == "fake":
+        return FakeTransport()
+    return AfricasTalkingTransport()
+
+
+class RateLimiter:
+    """Token bucket over recipients per second, shared by all sends."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self, tokens: float):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # a request larger than the bucket is let through once it is full
+            if self._tokens >= min(tokens, self.capacity):
+                self._tokens -= tokens
+                return
+            await asyncio.sleep((min(tokens, self.capacity) - self._tokens) / self.rate)
+
+
+class SmsDispatcher:
+    def __init__(
+        self,
+        transport: SmsTransport | None = None,
+        session_factory=AsyncSessionLocal,
+        batch_size: int = settings.sms_batch_size,
+        recipients_per_request: int = settings.sms_recipients_per_request,
+        rate_per_second: float = settings.sms_rate_per_second,
+        max_attempts: int = settings.sms_max_attempts,
+        retry_base_seconds: float = settings.sms_retry_base_seconds,
+        retry_max_seconds: float = settings.sms_retry_max_seconds,
+        lease_seconds: float = settings.sms_lease_seconds,
+    ):
+        self.transport = transport or get_transport()
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.recipients_per_request = recipients_per_request
+        self.limiter = RateLimiter(rate_per_second)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.lease_seconds = lease_seconds
+
+    def backoff(self, attempts: int) -> timedelta:
+        delay = min(self.retry_base_seconds * 2 ** (attempts - 1), self.retry_max_seconds)
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    async def claim(self) -> list:
+        """Lease a batch of due messages.
+
+        Claimed rows get their attempt counted and next_attempt_at pushed
+        out by the lease, in one committed statement. SKIP LOCKED keeps
+        several dispatchers from claiming the same rows. If a dispatcher
+        dies mid-send, its rows come due again when the lease runs out;
+        those that already had their last attempt are marked failed
+        instead, so a message that crashes the worker is not retried
+        forever.
+        """
+        now = datetime.now()
+        outbox = models.SmsOutbox
+        pending_due = (
+            outbox.status == models.SmsStatus.pending,
+            outbox.next_attempt_at <= now,
+        )
+        due = (
+            select(outbox.id)
+            .where(*pending_due, outbox.attempts < self.max_attempts)
+            .order_by(outbox.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+            .cte("due")
+        )
+        async with self.session_factory() as db:
+            # only a lapsed lease leaves a due row pending with no attempts left
+            await db.execute(
+                update(outbox)
+                .where(*pending_due, outbox.attempts >= self.max_attempts)
+                .values(
+                    status=models.SmsStatus.failed,
+                    last_error="Lease expired on the last attempt",
+                )
+            )
+            rows = await db.execute(
+                update(outbox)
+                .where(outbox.id.in_(select(due.c.id)))
+                .values(
+                    attempts=outbox.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=self.lease_seconds),
+                )
+                .returning(outbox.id, outbox.phone_number, outbox.message, outbox.attempts)
+            )
+            claimed = rows.all()
+            await db.commit()
+        return claimed
+
+    async def _send(self, message: str, numbers: list[str]) -> dict[str, SmsDelivery]:
+        await self.limiter.acquire(len(numbers))
+        try:
+            return await asyncio.to_thread(self.transport.send, message, numbers)
+        except Exception as exc:
+            logger.warning("SMS send to %d recipients failed: %s", len(numbers), exc)
+            return {
+                number: SmsDelivery(success=False, status=f"{exc.__class__.__name__}: {exc}")
+                for number in numbers
+            }
+
+    async def dispatch_once(self) -> int:
+        """Deliver one claimed batch; returns how many rows were processed."""
+        claimed = await self.claim()
+        if not claimed:
+            return 0
+
+        by_message = defaultdict(list)
+        for row in claimed:
+            by_message[row.message].append(row)
+
+        outcomes = []
+        for message, rows in by_message.items():
+            for start in range(0, len(rows), self.recipients_per_request):
+                chunk = rows[start : start + self.recipients_per_request]
+                numbers = [to_international_phone(row.phone_number) for row in chunk]
+                deliveries = await self._send(message, list(dict.fromkeys(numbers)))
+                for row, number in zip(chunk, numbers):
+                    outcomes.append(self._outcome(row, deliveries.get(number)))
+
+        table = models.SmsOutbox.__table__
+        async with self.session_factory() as db:
+            await db.execute(
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .values(
+                    status=bindparam("new_status"),
+                    next_attempt_at=bindparam("retry_at"),
+                    last_error=bindparam("error"),
+                    provider_message_id=bindparam("message_id"),
+                    provider_status=bindparam("provider_status"),
+                    sent_at=bindparam("delivered_at"),
+                ),
+                outcomes,
+            )
+            await db.commit()
+        return len(claimed)
+
+    def _outcome(self, row, delivery: SmsDelivery | None) -> dict:
+        now = datetime.now()
+        if delivery is None:
+            delivery = SmsDelivery(success=False, status="No result from provider")
+        if delivery.success:
+            status, retry_at, error = models.SmsStatus.sent, now, None
+        elif delivery.retryable and row.attempts < self.max_attempts:
+            status, retry_at, error = models.SmsStatus.pending, now + self.backoff(row.attempts), delivery.status
+        else:
+            status, retry_at, error = models.SmsStatus.failed, now, delivery.status
+        return {
+            "row_id": row.id,
+            "new_status": status,
+            "retry_at": retry_at,
+            "error": error,
+            "message_id": delivery.message_id,
+            "provider_status": delivery.status,
+            "delivered_at": now if delivery.success else None,
+        }
+
+    async def run(self, stop: asyncio.Event, poll_interval: float = settings.sms_poll_interval_seconds):
+        """Dispatch until ``stop`` is set, sleeping only when nothing is due."""
+        while not stop.is_set():
+            try:
+                processed = await self.dispatch_once()
+            except Exception:
+                logger.exception("SMS dispatch failed")
+                processed = 0
+            if not processed:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(SmsDispatcher().run(asyncio.Event()))
@@ -0,0 +1,156 @@
+"""PDF invoices.
+
+Rendering is CPU-bound Python, so it runs in a small process pool rather
+than on the event loop. Rendered documents are cached under a hash of
+the invoice's contents and RENDER_VERSION: a changed invoice gets a new
+key, and edits also drop the invoice's previous entry (see
+``invalidate``) so it does not linger until it expires.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from . import schemas
+from .cache import TTLCache
+from .config import settings
+
+
+# bump when the layout changes so cached documents are re-rendered
+RENDER_VERSION = 1
+
+pdf_cache = TTLCache(maxsize=settings.pdf_cache_size, ttl=settings.pdf_cache_ttl_seconds)
+# invoice id -> cache key of its last rendered contents
+_rendered_keys = TTLCache(maxsize=settings.pdf_cache_size, ttl=settings.pdf_cache_ttl_seconds)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    # created on first use, so importing the app does not start processes;
+    # spawned rather than forked from a process with threads and open sockets
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.pdf_render_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def cache_key(document: dict) -> str:
+    payload = json.dumps([RENDER_VERSION, document], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render_invoice_pdf(document: dict) -> bytes:
+    """Render an invoice document to PDF bytes; runs in a worker process."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        title=f"Invoice {document['invoice_number']}",
+        author=document["business_name"],
+        leftMargin=18 * mm,
+        rightMargin=18 * mm,
+        topMargin=18 * mm,
+        bottomMargin=18 * mm,
+        # no timestamps or random ids, so the same invoice renders the same bytes
+        invariant=1,
+    )
+
+    def text(value) -> str:
+        return "" if value is None else str(value).replace("&", "&amp;").replace("<", "&lt;")
+
+    story = [
+        Paragraph(text(document["business_name"]), styles["Title"]),
+        Paragraph(f"Invoice {text(document['invoice_number'])}", styles["Heading2"]),
+        Spacer(1, 4 * mm),
+    ]
+    details = [
+        ["Billed to", f"{document['customer_name']}"
+         + (f" ({document['customer_phone']})" if document["customer_phone"] else "")],
+        ["Issued", document["created_at"][:10]],
+        ["Due", document["due_date"][:10]],
+        ["Status", document["status"].capitalize()],
+    ]
+    story += [
+        Table(details, colWidths=[30 * mm, None], hAlign="LEFT"),
+        Spacer(1, 6 * mm),
+    ]
+
+    rows = [["Item", "Qty", "Unit price", "Amount"]]
+    for item in document["line_items"]:
+        name = text(item["product_name"])
+        if item["description"]:
+            name += f"<br/><font size=8>{text(item['description'])}</font>"
+        rows.append(
+            [
+                Paragraph(name, styles["BodyText"]),
+                str(item["quantity"]),
+                f"{item['unit_price']:,.2f}",
+                f"{item['transaction_value']:,.2f}",
+            ]
+        )
+    rows.append(["", "", "Total", f"{document['total_amount']:,.2f}"])
+    items = Table(rows, colWidths=[None, 18 * mm, 30 * mm, 30 * mm], repeatRows=1)
+    items.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#eeeeee")),
+                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
+                ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+                ("VALIGN", (0, 0), (-1, -1), "TOP"),
+                ("LINEBELOW", (0, 0), (-1, 0), 0.5, colors.grey),
+                ("LINEABOVE", (0, -1), (-1, -1), 0.5, colors.grey),
+            ]
+        )
+    )
+    story.append(items)
+    if document["notes"]:
+        story += [Spacer(1, 6 * mm), Paragraph(text(document["notes"]), styles["BodyText"])]
+    story += [Spacer(1, 10 * mm), Paragraph("Thank you for your business!", styles["Italic"])]
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+async def get_invoice_pdf(invoice_id: int, invoice: schemas.InvoiceOut) -> bytes:
+    """The invoice's PDF, from the cache or rendered in the worker pool."""
+    document = invoice.model_dump(mode="json")
+    key = cache_key(document)
+    pdf = pdf_cache.get(key)
+    if pdf is None:
+        loop = asyncio.get_running_loop()
+        pdf = await loop.run_in_executor(_get_executor(), render_invoice_pdf, document)
+        pdf_cache.set(key, pdf)
+    previous = _rendered_keys.get(invoice_id)
+    if previous and previous != key:
+        pdf_cache.pop(previous)
+    _rendered_keys.set(invoice_id, key)
+    return pdf
+
+
+def invalidate(invoice_id: int):
+    """Drop the cached PDF of an invoice that was edited or deleted."""
+    key = _rendered_keys.pop(invoice_id, None)
+    if key:
+        pdf_cache.pop(key)
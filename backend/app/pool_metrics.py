@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """Checkout latency and timeout counters for a connection pool.
+
+    Latencies are kept in a bounded window so percentiles reflect recent
+    traffic without growing with uptime.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._samples: deque[float] = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+
+    def observe_checkout(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_seconds_total += seconds
+            self.checkout_seconds_max = max(self.checkout_seconds_max, seconds)
+            self._samples.append(seconds)
+
+    def observe_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def _percentile(self, samples: list[float], pct: float) -> float:
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+    def snapshot(self, pool: QueuePool) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            checkouts = self.checkouts
+            timeouts = self.timeouts
+            total = self.checkout_seconds_total
+            slowest = self.checkout_seconds_max
+        return {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # negative while the pool has not yet opened pool_size connections
+            "overflow": pool.overflow(),
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "checkout_ms_avg": (total / checkouts * 1000) if checkouts else 0.0,
+            "checkout_ms_p50": self._percentile(samples, 0.50) * 1000,
+            "checkout_ms_p95": self._percentile(samples, 0.95) * 1000,
+            "checkout_ms_p99": self._percentile(samples, 0.99) * 1000,
+            "checkout_ms_max": slowest * 1000,
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waits."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_metrics.observe_timeout()
+            raise
+        pool_metrics.observe_checkout(time.perf_counter() - start)
+        return connection
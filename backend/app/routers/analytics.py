@@ -0,0 +1,25 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import analytics, database, schemas
+from app.deps import get_current_active_user
+from app.instrumentation import InstrumentedRoute
+
+
+router = APIRouter(prefix="/analytics", tags=["analytics"], route_class=InstrumentedRoute)
+
+
+@router.get("/{username}/dashboard", response_model=schemas.AnalyticsDashboardOut)
+async def get_dashboard(
+    username: str,
+    params: Annotated[schemas.AnalyticsParams, Query()],
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    if username != current_user.username:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    if params.date_from and params.date_to and params.date_from > params.date_to:
+        raise HTTPException(status_code=400, detail="date_from is after date_to")
+    return await analytics.get_dashboard(db, current_user.id, params)
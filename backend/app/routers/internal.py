@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from .. import database
+from app.deps import require_internal_token
+from app.instrumentation import InstrumentedRoute, registry
+from app.pool_metrics import pool_metrics
+
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    include_in_schema=False,
+    dependencies=[Depends(require_internal_token)],
+    route_class=InstrumentedRoute,
+)
+
+
+@router.get("/metrics/db-pool")
+async def db_pool_metrics():
+    return pool_metrics.snapshot(database.async_engine.pool)
+
+
+# Prometheus scrape endpoint, at /metrics where scrapers look by default; per-route
+# query counts and latencies are internal, so it needs the token too
+metrics_router = APIRouter(
+    include_in_schema=False,
+    dependencies=[Depends(require_internal_token)],
+    route_class=InstrumentedRoute,
+)
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def request_metrics():
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,61 +1,96 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated, List
 
-from .. import schemas, crud, database
-from app.models import User
+from .. import schemas, crud, database, export, http_cache, invoice_import, pdf, serialization
 from app.utils import generate_random_password
 from app.deps import get_current_active_user
+from app.instrumentation import InstrumentedRoute
 from fastapi import APIRouter, Depends, HTTPException
 
 
-router = APIRouter(prefix="/invoices", tags=["invoices"])
+router = APIRouter(prefix="/invoices", tags=["invoices"], route_class=InstrumentedRoute)
 
 
 @router.post("/create", response_model=schemas.InvoiceOut)
-def create_invoice(
+async def create_invoice(
     invoice: schemas.InvoiceCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(database.get_db),
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
     if current_user.username != invoice.username:
-        return {"error": "Unauthorized"}
+        raise HTTPException(status_code=403, detail="Unauthorized")
     customer_phone = invoice.customer.phone_number if invoice.customer else invoice.customer_phone
 
+    customer_id = None
     if customer_phone:
         # Check if customer exists by phone number
-        customer = (
-            db.query(User)
-            .filter(User.phone_number == customer_phone)
-            .first()
-        )
+        customer = await crud.get_user_by_phone(db, phone_number=customer_phone)
         if customer:
-            new_invoice = crud.create_invoice(
-                db=db, invoice=invoice, customer_id=customer.id
-            )
+            customer_id = customer.id
 
     if (invoice.customer and not invoice.customer.full_name) and not invoice.customer_name:
-        return {"error": "Customer name is required"}
+        raise HTTPException(status_code=400, detail="Customer name is required")
 
     # create invoice (using customer_id)
-    new_invoice = crud.create_invoice(db=db, invoice=invoice)
+    new_invoice = await crud.create_invoice(
+        db=db, invoice=invoice, customer_id=customer_id, business_id=current_user.id
+    )
 
     return new_invoice
 
+@router.post("/create-batch", response_model=schemas.InvoiceBatchOut)
+async def create_invoice_batch(
+    batch: schemas.InvoiceBatchCreate,
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    results = await crud.create_invoices_batch(
+        db,
+        business_id=current_user.id,
+        username=current_user.username,
+        invoices=batch.invoices,
+    )
+    failed = sum(1 for result in results if result.error)
+    return schemas.InvoiceBatchOut(
+        created=len(results) - failed, failed=failed, results=results
+    )
+
+@router.post("/import/{username}", response_model=schemas.InvoiceImportOut)
+async def import_invoices(
+    username: str,
+    file: UploadFile,
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    if username != current_user.username:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    try:
+        return await invoice_import.import_invoices(
+            db,
+            business_id=current_user.id,
+            username=username,
+            upload=file.file,
+            filename=file.filename or "",
+        )
+    except invoice_import.ImportFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
 @router.post("/create-anonymous", response_model=schemas.InvoiceOut)
-def create_anonymous_invoice(
-    invoice: schemas.InvoiceCreate, db: Session = Depends(database.get_db)
+async def create_anonymous_invoice(
+    invoice: schemas.InvoiceCreate, db: AsyncSession = Depends(database.get_async_db)
 ):
     # Check if customer exists by phone number
     # TODO: On app startup, create a default anonymous customer if not exists
-    customer = db.query(User).filter(User.username == "anonymous_customer").first()
+    customer = await crud.get_user(db, "anonymous_customer")
     password_text = None
 
     if not customer:
         # create new customer with random password
         password_text = generate_random_password()
 
-        customer = crud.create_user(
+        customer = await crud.create_user(
             db,
             schemas.UserCreate(
                 full_name="Anonymous Customer",
@@ -65,79 +100,218 @@ def create_anonymous_invoice(
         )
     invoice.username = "anonymous_business"
     # create invoice (using customer_id)
-    new_invoice = crud.create_invoice(db=db, invoice=invoice, customer_id=customer.id)
+    new_invoice = await crud.create_invoice(db=db, invoice=invoice, customer_id=customer.id)
 
     return new_invoice
 
 
 @router.put("/edit/{invoice_number}", response_model=schemas.InvoiceOut)
-def edit_invoice(
+async def edit_invoice(
     invoice_number: str,
     invoice: schemas.InvoiceUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(database.get_db),
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
 
     business_id = current_user.id
-    existing_invoice = crud.get_business_invoice(
+    existing_invoice = await crud.get_business_invoice(
         db, business_id=business_id, invoice_number=invoice_number
     )
 
     if not existing_invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
 
-    updated_invoice = crud.update_invoice(
+    updated_invoice = await crud.update_invoice(
         db, invoice=existing_invoice, invoice_data=invoice
     )
     return updated_invoice
 
 
 @router.put("/delete/{invoice_number}", response_model=schemas.InvoiceDelete)
-def delete_invoice(
+async def delete_invoice(
     invoice_number: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(database.get_db),
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
     business_id = current_user.id
-    existing_invoice = crud.get_business_invoice(
+    existing_invoice = await crud.get_business_invoice(
         db, business_id=business_id, invoice_number=invoice_number
     )
 
     if not existing_invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
 
-    deleted_invoice = crud.delete_invoice(db, invoice=existing_invoice)
+    deleted_invoice = await crud.delete_invoice(db, invoice=existing_invoice)
     return deleted_invoice
 
 
+@router.get("/export/{username}")
+async def export_invoices(
+    username: str,
+    params: Annotated[schemas.InvoiceExportParams, Query()],
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+):
+    if username != current_user.username:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    headers = {
+        "Content-Disposition": f'attachment; filename="{export.export_filename(username, params)}"'
+    }
+    media_type = export.MEDIA_TYPES[params.format]
+    if params.gzip:
+        media_type = "application/gzip"
+    return StreamingResponse(
+        export.stream_export(current_user.id, params), media_type=media_type, headers=headers
+    )
+
+
+def _invoice_page(response: Response, page) -> Response:
+    invoices, next_cursor = page
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return serialization.invoice_list_response(invoices, response)
+
+
+async def _list_validators(
+    db: AsyncSession, user_id: int, listing: str, params: schemas.InvoiceListParams
+):
+    """ETag and Last-Modified of a list page, from the user's invoice version.
+
+    Every invoice write bumps the version of both its business and its
+    customer, so an unchanged version means an unchanged page.
+    """
+    version, updated_at = await crud.get_invoice_list_version(db, user_id)
+    etag = http_cache.make_etag(listing, user_id, version, params.model_dump_json())
+    return etag, updated_at
+
+
+@router.get("/search/{username}", response_model=List[schemas.InvoiceOut])
+async def search_invoices(
+    username: str,
+    response: Response,
+    params: Annotated[schemas.InvoiceSearchParams, Query()],
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    if username != current_user.username:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    try:
+        page = await crud.search_invoices(db, business_id=current_user.id, params=params)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _invoice_page(response, page)
+
+
 @router.get("/user/{username}", response_model=List[schemas.InvoiceOut])
-def get_user_invoices(
+async def get_user_invoices(
     username: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(database.get_db),
+    request: Request,
+    response: Response,
+    params: Annotated[schemas.InvoiceListParams, Query()],
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
     if username != current_user.username:
         raise HTTPException(status_code=403, detail="Unauthorized")
-    return crud.get_all_user_invoices(db, username=username)
+    etag, last_modified = await _list_validators(db, current_user.id, "user", params)
+    if http_cache.is_not_modified(request, etag, last_modified):
+        return http_cache.not_modified(etag, last_modified)
+    try:
+        page = await crud.get_all_user_invoices(db, username=username, params=params)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    http_cache.set_validators(response, etag, last_modified)
+    return _invoice_page(response, page)
 
 
 @router.get("/business/{username}", response_model=List[schemas.InvoiceOut])
-def get_business_invoices(
+async def get_business_invoices(
     username: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(database.get_db),
+    request: Request,
+    response: Response,
+    params: Annotated[schemas.InvoiceListParams, Query()],
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
     if username != current_user.username:
         raise HTTPException(status_code=403, detail="Unauthorized")
-    return crud.get_invoices_by_business(db, business_id=current_user.id)
+    etag, last_modified = await _list_validators(db, current_user.id, "business", params)
+    if http_cache.is_not_modified(request, etag, last_modified):
+        return http_cache.not_modified(etag, last_modified)
+    try:
+        page = await crud.get_invoices_by_business(
+            db, business_id=current_user.id, params=params
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    http_cache.set_validators(response, etag, last_modified)
+    return _invoice_page(response, page)
 
 
 @router.get("/customer/{username}", response_model=List[schemas.InvoiceOut])
-def get_customer_invoices(
+async def get_customer_invoices(
     username: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(database.get_db),
+    request: Request,
+    response: Response,
+    params: Annotated[schemas.InvoiceListParams, Query()],
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
     if username != current_user.username:
         raise HTTPException(status_code=403, detail="Unauthorized")
-    return crud.get_invoices_by_customer(db, customer_id=current_user.id)
+    etag, last_modified = await _list_validators(db, current_user.id, "customer", params)
+    if http_cache.is_not_modified(request, etag, last_modified):
+        return http_cache.not_modified(etag, last_modified)
+    try:
+        page = await crud.get_invoices_by_customer(
+            db, customer_id=current_user.id, params=params
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    http_cache.set_validators(response, etag, last_modified)
+    return _invoice_page(response, page)
+
+
+# after the list routes, so that /user/pdf still lists the invoices of user "pdf"
+@router.get("/{invoice_number}/pdf", response_class=Response)
+async def get_invoice_pdf(
+    invoice_number: str,
+    request: Request,
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    invoice = await crud.get_cached_invoice(
+        db, user_id=current_user.id, invoice_number=invoice_number
+    )
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    etag = http_cache.make_etag("pdf", invoice.id, invoice.updated_at, pdf.RENDER_VERSION)
+    if http_cache.is_not_modified(request, etag, invoice.updated_at):
+        return http_cache.not_modified(etag, invoice.updated_at)
+
+    response = Response(
+        content=await pdf.get_invoice_pdf(invoice.id, invoice.data),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'inline; filename="{invoice_number}.pdf"'},
+    )
+    http_cache.set_validators(response, etag, invoice.updated_at)
+    return response
+
+
+@router.get("/{invoice_number}", response_model=schemas.InvoiceOut)
+async def get_invoice(
+    invoice_number: str,
+    request: Request,
+    response: Response,
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    invoice = await crud.get_cached_invoice(
+        db, user_id=current_user.id, invoice_number=invoice_number
+    )
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    etag = http_cache.make_etag("invoice", invoice.id, invoice.updated_at)
+    if http_cache.is_not_modified(request, etag, invoice.updated_at):
+        return http_cache.not_modified(etag, invoice.updated_at)
+    http_cache.set_validators(response, etag, invoice.updated_at)
+    return serialization.invoice_response(invoice.data, response)
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from .. import schemas, crud, database
-from app.models import User
 from app.security import create_access_token
 from app.deps import get_current_active_user, authenticate_user
+from app.instrumentation import InstrumentedRoute
 from typing import Annotated
 from fastapi.security import OAuth2PasswordRequestForm
 from app.schemas import TokenType
@@ -11,34 +11,56 @@ from app.security import ACCESS_TOKEN_EXPIRE_MINUTES
 from datetime import timedelta
 
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=InstrumentedRoute)
 
 
 @router.get("/me")
-def get_me(current_user: User = Depends(get_current_active_user)):
+async def get_me(
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    user = await crud.get_user(db, username=current_user.username)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
     return {
-        "full_name": current_user.full_name,
-        "username": current_user.username,
-        "phone_number": current_user.phone_number,
-        "created_at": current_user.created_at,
+        "full_name": user.full_name,
+        "username": user.username,
+        "phone_number": user.phone_number,
+        "created_at": user.created_at,
     }
 
 
+@router.get("/{username}/stats", response_model=schemas.UserStatsOut)
+async def get_user_stats(
+    username: str,
+    current_user: schemas.AuthUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    if username != current_user.username:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    stats = await crud.get_user_stats(db, user_id=current_user.id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Stats not found")
+    return stats
+
+
 @router.post("/register", response_model=schemas.UserOut)
-def register_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    existing = crud.get_user_by_phone(db, phone_number=user.phone_number)
+async def register_user(
+    user: schemas.UserCreate, db: AsyncSession = Depends(database.get_async_db)
+):
+    existing = await crud.get_user_by_phone(db, phone_number=user.phone_number)
     if existing:
         raise HTTPException(status_code=400, detail="Phone number already registered")
 
-    return crud.create_user(db=db, user=user)
+    return await crud.create_user(db=db, user=user)
 
 
 @router.post("/token")
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
 ) -> TokenType:
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
+from datetime import date, datetime
 
 class TokenType(BaseModel):
     access_token: str
@@ -10,6 +10,14 @@ class TokenType(BaseModel):
 class TokenData(BaseModel):
     username: str | None = None
 
+class AuthUser(BaseModel):
+    id: int
+    username: str
+    disabled: bool
+
+    class Config:
+        from_attributes = True
+
 class LoginRequest(BaseModel):
     phone_number: str
     password: str 
@@ -34,6 +42,16 @@ class UserOut(BaseModel):
         from_attributes = True
 
 
+class UserStatsOut(BaseModel):
+    total_invoices_sent: int
+    total_invoices_received: int
+    total_amount_paid_in: float
+    total_amount_paid_out: float
+
+    class Config:
+        from_attributes = True
+
+
 # ---------- Line Item ----------
 class LineItemCreate(BaseModel):
     product_name: str
@@ -86,6 +104,115 @@ class InvoiceOut(BaseModel):
     class Config:
         from_attributes = True
 
+class InvoiceBatchCreate(BaseModel):
+    invoices: List[InvoiceCreate] = Field(min_length=1, max_length=5000)
+
+
+class InvoiceBatchResult(BaseModel):
+    index: int
+    invoice_number: Optional[str] = None
+    error: Optional[str] = None
+
+
+class InvoiceBatchOut(BaseModel):
+    created: int
+    failed: int
+    results: List[InvoiceBatchResult]
+
+
+class InvoiceListParams(BaseModel):
+    cursor: Optional[str] = None
+    limit: int = Field(default=50, ge=1, le=200)
+    status: Optional[Literal["sent", "paid", "overdue", "cancelled", "draft"]] = None
+    due_from: Optional[datetime] = None
+    due_to: Optional[datetime] = None
+    customer_phone: Optional[str] = None
+
+
+class InvoiceSearchParams(BaseModel):
+    q: str = Field(min_length=1, max_length=200)
+    cursor: Optional[str] = None
+    limit: int = Field(default=20, ge=1, le=100)
+
+
+class InvoiceImportError(BaseModel):
+    row: int  # line of the invoice's first row in the file
+    invoice_number: Optional[str]  # as given in the file
+    error: str
+
+
+class InvoiceImportOut(BaseModel):
+    imported: int
+    failed: int
+    errors: List[InvoiceImportError]
+    invoice_numbers: Dict[str, str]  # file invoice_number -> the number it was imported as
+
+
+class InvoiceExportParams(BaseModel):
+    format: Literal["csv", "ndjson"] = "csv"
+    gzip: bool = False
+    status: Optional[Literal["sent", "paid", "overdue", "cancelled", "draft"]] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+
 class InvoiceDelete(BaseModel):
     invoice_number: str
-    status: str
\ No newline at end of file
+    status: str
+
+
+# ---------- Analytics ----------
+class AnalyticsParams(BaseModel):
+    period: Literal["day", "week", "month"] = "month"
+    date_from: Optional[date] = None  # defaults to a year before date_to
+    date_to: Optional[date] = None  # defaults to today
+    top: int = Field(default=5, ge=1, le=50)
+
+
+class AnalyticsPeriodOut(BaseModel):
+    period: date
+    invoice_count: int
+    total_amount: float
+    paid_amount: float
+    outstanding_amount: float
+
+
+class AnalyticsStatusOut(BaseModel):
+    status: str
+    invoice_count: int
+    total_amount: float
+
+
+class AnalyticsAgingOut(BaseModel):
+    bucket: str
+    invoice_count: int
+    total_amount: float
+
+
+class AnalyticsCustomerOut(BaseModel):
+    rank: int
+    customer_name: str
+    customer_phone: Optional[str]
+    invoice_count: int
+    total_amount: float
+    paid_amount: float
+
+
+class AnalyticsProductOut(BaseModel):
+    rank: int
+    product_name: str
+    quantity: int
+    total_amount: float
+
+
+class AnalyticsDashboardOut(BaseModel):
+    period: str
+    date_from: date
+    date_to: date
+    paid_amount: float
+    outstanding_amount: float
+    revenue: List[AnalyticsPeriodOut]
+    statuses: List[AnalyticsStatusOut]
+    aging: List[AnalyticsAgingOut]
+    top_customers: List[AnalyticsCustomerOut]
+    top_products: List[AnalyticsProductOut]
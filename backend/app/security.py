@@ -1,8 +1,11 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 import jwt
 
 from .config import settings
+from .instrumentation import span
 
 
 SECRET_KEY = settings.secret_key
@@ -10,7 +13,22 @@ ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min and max rounds to the configured cost makes any hash made
+# with a different cost "need update", so logins rehash in both directions.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
+
+# bcrypt releases the GIL, so a small thread pool hashes in parallel while
+# the event loop keeps serving other requests. The pool size caps how many
+# cores a login storm can take.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt"
+)
 
 def get_password_hash(password: str):
     return pwd_context.hash(password)
@@ -19,9 +37,26 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    with span("bcrypt"):
+        return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """Verify off the event loop; also return a new hash if the cost changed."""
+    loop = asyncio.get_running_loop()
+    with span("bcrypt"):
+        return await loop.run_in_executor(
+            _hash_executor, pwd_context.verify_and_update, plain_password, hashed_password
+        )
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     expire = datetime.now() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
@@ -0,0 +1,105 @@
+"""Invoice responses encoded straight to JSON bytes.
+
+FastAPI validates a returned list against its response_model, dumps the
+result to Python dicts and then encodes those with the json module. For
+invoice pages most of the request's CPU goes there. Here pydantic-core
+writes the JSON in one Rust pass:
+
+- by default the ORM rows are validated once per list by a TypeAdapter
+  and dumped with ``dump_json``;
+- with SERIALIZATION_TRUSTED_ROWS the rows, which come from our own
+  database through InvoiceOut-shaped queries, are not validated again.
+  Their attributes are read into plain structures that mirror the
+  schema, and ``to_json`` encodes them.
+
+Both produce the same JSON as the response_model path, which the routes
+keep for the OpenAPI schema. The returned Response carries the headers
+set on the route's injected response (cursor, validators), as FastAPI
+would have merged them.
+"""
+import types
+import typing
+from enum import Enum
+from typing import Any, Callable, List
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+from . import schemas
+from .config import settings
+
+
+INVOICE_LIST = TypeAdapter(List[schemas.InvoiceOut])
+
+
+def _nested_reader(annotation) -> Callable[[Any], Any] | None:
+    """Reader for a field holding models, or None for plain values."""
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        readers = [_nested_reader(arg) for arg in typing.get_args(annotation)]
+        return next((reader for reader in readers if reader), None)
+    if origin is list:
+        item = _nested_reader(typing.get_args(annotation)[0])
+        return (lambda values: [item(value) for value in values]) if item else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return attribute_reader(annotation)
+    return None
+
+
+_MISSING = object()
+
+
+def attribute_reader(model: type[BaseModel]) -> Callable[[Any], dict]:
+    """Read an object's attributes into a dict shaped like ``model``, without validating.
+
+    Loaded ORM attributes are read from the instance ``__dict__``, which
+    skips SQLAlchemy's attribute descriptors; anything else falls back to
+    getattr. Enums become their values, as the str fields they fill would
+    have made them.
+    """
+    fields = [
+        (name, _nested_reader(field.annotation)) for name, field in model.model_fields.items()
+    ]
+
+    def read(obj) -> dict:
+        loaded = obj.__dict__
+        data = {}
+        for name, nested in fields:
+            value = loaded.get(name, _MISSING)
+            if value is _MISSING:
+                value = getattr(obj, name)
+            if value is None:
+                pass
+            elif nested:
+                value = nested(value)
+            elif isinstance(value, Enum):
+                value = value.value
+            data[name] = value
+        return data
+
+    return read
+
+
+_read_invoice = attribute_reader(schemas.InvoiceOut)
+
+
+def invoice_list_json(invoices, trusted: bool | None = None) -> bytes:
+    if settings.serialization_trusted_rows if trusted is None else trusted:
+        return to_json([_read_invoice(invoice) for invoice in invoices])
+    return INVOICE_LIST.dump_json(INVOICE_LIST.validate_python(invoices, from_attributes=True))
+
+
+def json_response(content: bytes, response: Response) -> Response:
+    fast = Response(content=content, media_type="application/json")
+    fast.headers.raw.extend(response.headers.raw)
+    return fast
+
+
+def invoice_list_response(invoices, response: Response) -> Response:
+    return json_response(invoice_list_json(invoices), response)
+
+
+def invoice_response(invoice: schemas.InvoiceOut, response: Response) -> Response:
+    """An already validated InvoiceOut, such as a cached one."""
+    return json_response(invoice.model_dump_json().encode(), response)
@@ -0,0 +1,61 @@
+"""Production server: python -m app.server
+
+Runs the API in SERVER_WORKERS uvicorn worker processes, so a burst of
+bcrypt or serialization work on one core does not stall every request.
+uvicorn picks uvloop and httptools when they are installed (both are in
+requirements.txt) and falls back to asyncio and h11 otherwise.
+
+Each worker has its own connection pools, PDF render processes and
+bcrypt threads, so those settings multiply by the worker count. Set
+DB_MAX_CONNECTIONS to keep the pools within Postgres' max_connections
+(see database.pool_limits).
+"""
+import logging
+import os
+
+import uvicorn
+
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def worker_count() -> int:
+    if settings.server_workers:
+        return settings.server_workers
+    # process_cpu_count (3.13+) respects CPU affinity
+    cpu_count = getattr(os, "process_cpu_count", os.cpu_count)
+    return cpu_count() or 1
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    workers = worker_count()
+    # workers are spawned with this environment, so each sizes its pools for the
+    # real worker count; checked here too so a bad budget fails once, up front
+    os.environ["SERVER_WORKERS"] = str(workers)
+    from .database import pool_limits
+
+    pool_size, max_overflow = pool_limits(workers)
+    per_worker = pool_size + max_overflow + settings.db_counter_pool_size
+    logger.info(
+        "Starting %d workers, up to %d database connections each (%d in total)",
+        workers, per_worker, workers * per_worker,
+    )
+    uvicorn.run(
+        "app.main:app",
+        host=settings.server_host,
+        port=settings.server_port,
+        workers=workers,
+        loop="auto",
+        http="auto",
+        timeout_keep_alive=settings.server_keepalive_seconds,
+        timeout_graceful_shutdown=settings.server_graceful_timeout_seconds,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.server_forwarded_allow_ips,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,10 @@
-# import package
-import africastalking
+import base64
 from datetime import datetime
 import random
 import string
 import re
 
 
-# Initialize SDK
-username = "smeazy_invoices"    # use 'sandbox' for development in the test environment
-api_key = "atsk_28e13f1f258c83c1adad736397c902f3679dd368a094dc97c2b1e83d7addad2280edd39d"      # use your sandbox app API key for development in the test environment
-africastalking.initialize(username, api_key)
-
-
 def format_invoice(invoice) -> str:
     created_at = (
         invoice.created_at.strftime("%d %b %Y, %I:%M %p")
@@ -38,10 +31,14 @@ def format_invoice(invoice) -> str:
 
     return "\n".join(lines)
 
-def send_invoice(phone_number: str, invoice_id: int, message: str):
-    phone_number = f"+254{phone_number[1:]}"
-    response = africastalking.SMS.send(message, [phone_number])
-    return response
+def to_international_phone(phone_number: str) -> str:
+    """Normalize a local Kenyan number (07..., 01...) to +254 format."""
+    phone_number = phone_number.strip().replace(" ", "")
+    if phone_number.startswith("+"):
+        return phone_number
+    if phone_number.startswith("0"):
+        return f"+254{phone_number[1:]}"
+    return f"+{phone_number}"
 
 def slugify_name(full_name: str) -> str:
     """Convert full name to a lowercase, alphanumeric slug (username base)."""
@@ -54,4 +51,17 @@ def generate_random_password(length: int = 8) -> str:
     return ''.join(random.choice(chars) for _ in range(length))
 
 
+def encode_cursor(created_at: datetime, invoice_id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque page cursor."""
+    raw = f"{created_at.isoformat()}|{invoice_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
 
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a page cursor, raising ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, invoice_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(invoice_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
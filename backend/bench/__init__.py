@@ -0,0 +1 @@
+"""Load tests and benchmarks for the invoicing API; see docs/benchmarks.md."""
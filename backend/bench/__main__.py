@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+
+from .workloads import WORKLOADS
+
+
+def _seed(args):
+    if not args.yes:
+        sys.exit("Seeding truncates every table in the configured database; pass --yes")
+    from . import seed
+
+    asyncio.run(seed.seed(args.invoices, rng_seed=args.seed))
+
+
+def _run(args):
+    from . import runner
+
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        sys.exit(f"Unknown workloads: {', '.join(sorted(unknown))}")
+    results = asyncio.run(
+        runner.run(args.workloads, args.requests, args.concurrency, args.warmup, url=args.url)
+    )
+    output = Path(args.output) if args.output else runner.default_output_path()
+    runner.write_results(results, output)
+    print(runner.format_results(results))
+    print(f"\nWrote {output}")
+
+
+def _startup(args):
+    from . import runner, startup
+
+    timings = startup.measure(args.repeat, server=args.server)
+    results = runner.startup_results(timings, args.repeat, args.server)
+    output = Path(args.output) if args.output else runner.default_output_path("startup")
+    runner.write_results(results, output)
+    print(f"{'timing':<22}{'median':>10}{'min':>10}{'max':>10}")
+    for name, row in timings.items():
+        print(f"{name:<22}{row['median']:>10.1f}{row['min']:>10.1f}{row['max']:>10.1f}")
+    print(f"\nWrote {output}")
+
+
+def _serialization(args):
+    from . import runner, serialization
+
+    timings = serialization.measure(args.invoices, args.repeat)
+    results = runner.serialization_results(timings, args.invoices, args.repeat)
+    output = Path(args.output) if args.output else runner.default_output_path("serialization")
+    runner.write_results(results, output)
+    print(f"{'path':<12}{'cpu ms':>10}{'per 1000':>10}{'saved':>10}{'speedup':>9}")
+    for name, row in timings.items():
+        print(
+            f"{name:<12}{row['cpu_ms']:>10.1f}{row['cpu_ms_per_1000']:>10.1f}"
+            f"{row['saved_ms_per_1000']:>10.1f}{row['speedup']:>8.2f}x"
+        )
+    print(f"\nWrote {output}")
+
+
+def _compare(args):
+    from . import runner
+
+    before = json.loads(Path(args.before).read_text())
+    after = json.loads(Path(args.after).read_text())
+    print(runner.compare(before, after))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Load tests for the invoicing API.")
+    commands = parser.add_subparsers(required=True)
+
+    seed_parser = commands.add_parser("seed", help="replace the database contents with generated data")
+    seed_parser.add_argument(
+        "--invoices", type=int, default=10_000, metavar="N",
+        help="number of invoices, e.g. 1000 to 1000000",
+    )
+    seed_parser.add_argument("--seed", type=int, default=42, help="random seed")
+    seed_parser.add_argument("--yes", action="store_true", help="confirm truncating all tables")
+    seed_parser.set_defaults(func=_seed)
+
+    run_parser = commands.add_parser("run", help="run workloads and write a results file")
+    run_parser.add_argument(
+        "--workloads", nargs="+", default=list(WORKLOADS), metavar="NAME",
+        help=f"any of: {', '.join(WORKLOADS)}",
+    )
+    run_parser.add_argument("--requests", type=int, default=200, help="measured requests per workload")
+    run_parser.add_argument("--concurrency", type=int, default=10)
+    run_parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per workload")
+    run_parser.add_argument(
+        "--url", help="benchmark a running server instead of the app in this process; "
+        "query counts are only available in process",
+    )
+    run_parser.add_argument("--output", help="results file (default: bench/results/<time>-<commit>.json)")
+    run_parser.set_defaults(func=_run)
+
+    startup_parser = commands.add_parser(
+        "startup", help="time cold starts: import, lifespan and first requests"
+    )
+    startup_parser.add_argument("--repeat", type=int, default=5, help="cold starts to run")
+    startup_parser.add_argument(
+        "--server", action="store_true", help="time a uvicorn process until it answers instead"
+    )
+    startup_parser.add_argument("--output", help="results file (default: bench/results/startup-<time>-<commit>.json)")
+    startup_parser.set_defaults(func=_startup)
+
+    serialization_parser = commands.add_parser(
+        "serialization", help="CPU cost of encoding invoice lists, per response path"
+    )
+    serialization_parser.add_argument("--invoices", type=int, default=1000, help="invoices per list")
+    serialization_parser.add_argument("--repeat", type=int, default=20, help="encodings per path")
+    serialization_parser.add_argument(
+        "--output", help="results file (default: bench/results/serialization-<time>-<commit>.json)"
+    )
+    serialization_parser.set_defaults(func=_serialization)
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.set_defaults(func=_compare)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
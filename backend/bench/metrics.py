@@ -0,0 +1,86 @@
+"""Latency and query count collection for benchmark runs."""
+import statistics
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.database import async_engine, counter_engine
+
+
+# the running request's query counter; None outside a measured request
+_queries: ContextVar[Optional[list[int]]] = ContextVar("bench_queries", default=None)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def install_query_counter():
+    """Count statements sent by the app's engines during measured requests.
+
+    Only meaningful when the app runs in this process; the ASGI transport
+    runs each request in the task that sent it, so the counter set by
+    ``count_queries`` is visible to the app's queries.
+    """
+    for engine in (async_engine.sync_engine, counter_engine.sync_engine):
+        if not event.contains(engine, "before_cursor_execute", _count_query):
+            event.listen(engine, "before_cursor_execute", _count_query)
+
+
+@contextmanager
+def count_queries():
+    counter = [0]
+    token = _queries.set(counter)
+    try:
+        yield counter
+    finally:
+        _queries.reset(token)
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    if len(samples) == 1:
+        return {"p50_ms": samples[0], "p95_ms": samples[0], "p99_ms": samples[0]}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50_ms": cuts[49], "p95_ms": cuts[94], "p99_ms": cuts[98]}
+
+
+@dataclass
+class EndpointStats:
+    name: str
+    latencies_ms: list[float] = field(default_factory=list)
+    queries: list[int] = field(default_factory=list)
+    errors: int = 0
+    elapsed_seconds: float = 0.0
+
+    def observe(self, seconds: float, ok: bool, queries: Optional[int]):
+        self.latencies_ms.append(seconds * 1000)
+        if queries is not None:
+            self.queries.append(queries)
+        if not ok:
+            self.errors += 1
+
+    def summary(self) -> dict:
+        count = len(self.latencies_ms)
+        summary = {
+            "requests": count,
+            "errors": self.errors,
+            **_percentiles(self.latencies_ms),
+            "mean_ms": statistics.fmean(self.latencies_ms) if count else None,
+            "max_ms": max(self.latencies_ms, default=None),
+            "throughput_rps": count / self.elapsed_seconds if self.elapsed_seconds else None,
+            "queries_per_request": (
+                statistics.fmean(self.queries) if self.queries else None
+            ),
+            "queries_max": max(self.queries, default=None),
+        }
+        return {
+            key: round(value, 3) if isinstance(value, float) else value
+            for key, value in summary.items()
+        }
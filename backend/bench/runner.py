@@ -0,0 +1,203 @@
+"""Runs workloads and writes and compares result files."""
+import asyncio
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from sqlalchemy import func, select
+
+from app import models
+from app.config import settings
+from app.database import AsyncSessionLocal
+
+from .metrics import EndpointStats, install_query_counter
+from .workloads import WORKLOADS, BenchSession
+
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# settings that change what the numbers mean, recorded with every run
+RECORDED_SETTINGS = (
+    "db_pool_size",
+    "db_max_overflow",
+    "bcrypt_rounds",
+    "auth_cache_size",
+    "invoice_cache_size",
+    "analytics_use_rollups",
+)
+
+
+def _git_revision() -> Optional[dict]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return {"commit": commit, "dirty": bool(dirty)}
+
+
+async def _invoice_count() -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(models.Invoice))
+
+
+async def _run_workload(
+    session: BenchSession, name: str, requests: int, concurrency: int, warmup: int
+) -> EndpointStats:
+    workload = WORKLOADS[name]
+    warm = EndpointStats(name)
+    for _ in range(warmup):
+        await workload(session, warm)
+
+    stats = EndpointStats(name)
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await workload(session, stats)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    stats.elapsed_seconds = time.perf_counter() - started
+    return stats
+
+
+async def run(
+    workloads: list[str],
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    url: Optional[str] = None,
+) -> dict:
+    """Run each workload in turn and return the results document."""
+    if url:
+        transport, base_url, in_process = None, url, False
+    else:
+        from app.main import app
+
+        install_query_counter()
+        transport, base_url, in_process = httpx.ASGITransport(app=app), "http://bench", True
+
+    results = {}
+    timeout = httpx.Timeout(60.0)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=timeout) as client:
+        session = BenchSession(client, count_queries_enabled=in_process)
+        await session.setup()
+        for name in workloads:
+            stats = await _run_workload(session, name, requests, concurrency, warmup)
+            results[name] = stats.summary()
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "target": url or "in-process",
+            "invoices": await _invoice_count(),
+            "requests": requests,
+            "concurrency": concurrency,
+            "warmup": warmup,
+            "python": platform.python_version(),
+            "settings": {name: getattr(settings, name) for name in RECORDED_SETTINGS},
+        },
+        "endpoints": results,
+    }
+
+
+def default_output_path(kind: str = "") -> Path:
+    revision = _git_revision()
+    label = revision["commit"][:10] if revision else "unknown"
+    prefix = f"{kind}-" if kind else ""
+    return RESULTS_DIR / f"{prefix}{datetime.now():%Y%m%d-%H%M%S}-{label}.json"
+
+
+def write_results(results: dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2) + "\n")
+
+
+def startup_results(timings: dict, repeat: int, server: bool) -> dict:
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "target": "uvicorn" if server else "in-process",
+            "repeat": repeat,
+            "python": platform.python_version(),
+        },
+        "startup": timings,
+    }
+
+
+def serialization_results(timings: dict, invoices: int, repeat: int) -> dict:
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "invoices": invoices,
+            "repeat": repeat,
+            "python": platform.python_version(),
+        },
+        "serialization": timings,
+    }
+
+
+def _format(value, digits: int = 1) -> str:
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def _change(before, after) -> str:
+    if not before or after is None:
+        return ""
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+COMPARED = (
+    ("p50_ms", "p50"),
+    ("p95_ms", "p95"),
+    ("p99_ms", "p99"),
+    ("throughput_rps", "rps"),
+    ("queries_per_request", "queries"),
+)
+
+
+def compare(before: dict, after: dict) -> str:
+    """A table of each endpoint's numbers in ``before`` and ``after``."""
+    lines = [
+        f"{'endpoint':<14}{'metric':<9}{'before':>10}{'after':>10}{'change':>9}"
+    ]
+    for name in after["endpoints"]:
+        if name not in before["endpoints"]:
+            continue
+        old, new = before["endpoints"][name], after["endpoints"][name]
+        for key, label in COMPARED:
+            lines.append(
+                f"{name:<14}{label:<9}{_format(old[key]):>10}{_format(new[key]):>10}"
+                f"{_change(old[key], new[key]):>9}"
+            )
+    return "\n".join(lines)
+
+
+def format_results(results: dict) -> str:
+    lines = [
+        f"{'endpoint':<14}{'requests':>9}{'errors':>7}{'p50':>9}{'p95':>9}{'p99':>9}"
+        f"{'rps':>9}{'queries':>9}"
+    ]
+    for name, row in results["endpoints"].items():
+        lines.append(
+            f"{name:<14}{row['requests']:>9}{row['errors']:>7}{_format(row['p50_ms']):>9}"
+            f"{_format(row['p95_ms']):>9}{_format(row['p99_ms']):>9}"
+            f"{_format(row['throughput_rps']):>9}{_format(row['queries_per_request']):>9}"
+        )
+    return "\n".join(lines)
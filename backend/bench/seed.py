@@ -0,0 +1,196 @@
+"""Seed the configured database with a reproducible invoice data set.
+
+Everything is written with COPY in one transaction, then the derived
+tables (user_stats, rollups, search vectors, invoice counters) are
+rebuilt with the same crud functions the app uses. The first business
+gets half of all invoices, so it stands in for a large merchant.
+"""
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import text, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models
+from app.database import async_engine
+from app.db_utils import format_invoice_number
+from app.security import get_password_hash
+
+
+logger = logging.getLogger(__name__)
+
+BENCH_PASSWORD = "bench-password"
+CHUNK_SIZE = 20_000
+
+FIRST_NAMES = ["Jane", "John", "Amina", "Brian", "Wanjiku", "Otieno", "Akinyi", "Kevin", "Mercy", "Hassan"]
+LAST_NAMES = ["Mwangi", "Ochieng", "Kamau", "Njoroge", "Wafula", "Mutua", "Chebet", "Omondi", "Achieng", "Kiprop"]
+PRODUCTS = [
+    ("Maize flour 2kg", 180.0), ("Cooking oil 1L", 320.0), ("Sugar 1kg", 160.0),
+    ("Rice 5kg", 850.0), ("Delivery", 250.0), ("Consultation", 1500.0),
+    ("Airtime", 100.0), ("Tea leaves 500g", 290.0), ("Soap bar", 90.0), ("Repair service", 2000.0),
+]
+STATUSES = (
+    [models.InvoiceStatus.paid] * 55
+    + [models.InvoiceStatus.sent] * 25
+    + [models.InvoiceStatus.overdue] * 10
+    + [models.InvoiceStatus.draft] * 5
+    + [models.InvoiceStatus.cancelled] * 5
+)
+
+
+@dataclass
+class SeedPlan:
+    invoices: int
+    businesses: int
+    customers: int
+
+    @classmethod
+    def for_scale(cls, invoices: int) -> "SeedPlan":
+        return cls(
+            invoices=invoices,
+            businesses=max(2, invoices // 10_000),
+            customers=max(10, invoices // 20),
+        )
+
+
+def business_username(index: int) -> str:
+    return f"bench_business_{index}"
+
+
+def business_phone(index: int) -> str:
+    return f"0790{index:06d}"
+
+
+def customer_phone(index: int) -> str:
+    return f"0780{index:06d}"
+
+
+def _name(rnd: random.Random) -> str:
+    return f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+
+
+async def seed(invoices: int, rng_seed: int = 42) -> SeedPlan:
+    """Replace all data in the database with a generated data set."""
+    plan = SeedPlan.for_scale(invoices)
+    rnd = random.Random(rng_seed)
+    started = time.perf_counter()
+    password = get_password_hash(BENCH_PASSWORD)
+    now = datetime.now().replace(microsecond=0)
+
+    async with async_engine.begin() as conn:
+        await conn.execute(
+            text(
+                "TRUNCATE users, user_stats, invoices, line_items, invoice_counters, "
+                "invoice_daily_rollups, sms_outbox RESTART IDENTITY CASCADE"
+            )
+        )
+        copy = (await conn.get_raw_connection()).driver_connection
+
+        users = []
+        for index in range(plan.businesses):
+            users.append((len(users) + 1, business_username(index), f"Bench Shop {index}", business_phone(index)))
+        customers = []
+        for index in range(plan.customers):
+            user_id = len(users) + 1
+            name = _name(rnd)
+            users.append((user_id, f"bench_customer_{index}", name, customer_phone(index)))
+            customers.append((user_id, name, customer_phone(index)))
+        await copy.copy_records_to_table(
+            "users",
+            records=[(*user, password, now - timedelta(days=1200), False) for user in users],
+            columns=["id", "username", "full_name", "phone_number", "password", "created_at", "disabled"],
+        )
+        await copy.copy_records_to_table(
+            "user_stats",
+            records=[(user[0], 0, 0, 0.0, 0.0, 0) for user in users],
+            columns=[
+                "user_id", "total_invoices_sent", "total_invoices_received",
+                "total_amount_paid_in", "total_amount_paid_out", "invoices_version",
+            ],
+        )
+
+        next_number = [0] * plan.businesses
+        invoice_id = 0
+        for start in range(0, plan.invoices, CHUNK_SIZE):
+            invoice_rows, item_rows = [], []
+            for _ in range(min(CHUNK_SIZE, plan.invoices - start)):
+                invoice_id += 1
+                # half of everything belongs to the first business
+                business = 0 if rnd.random() < 0.5 else rnd.randrange(plan.businesses)
+                next_number[business] += 1
+                created_at = now - timedelta(seconds=rnd.randrange(3 * 365 * 86400))
+                if rnd.random() < 0.6:
+                    customer_id, name, phone = rnd.choice(customers)
+                else:
+                    customer_id, name = None, _name(rnd)
+                    phone = f"07{rnd.randrange(10**8):08d}" if rnd.random() < 0.7 else None
+                total = 0.0
+                for _ in range(rnd.randint(1, 4)):
+                    product, price = rnd.choice(PRODUCTS)
+                    quantity = rnd.randint(1, 10)
+                    total += price * quantity
+                    item_rows.append(
+                        (invoice_id, product, price, quantity, "product", None, price * quantity)
+                    )
+                invoice_rows.append(
+                    (
+                        invoice_id,
+                        business + 1,
+                        customer_id,
+                        name,
+                        phone,
+                        format_invoice_number(business + 1, next_number[business]),
+                        f"Bench Shop {business}",
+                        total,
+                        created_at,
+                        created_at,
+                        created_at + timedelta(days=30),
+                        rnd.choice(STATUSES).value,
+                        "",
+                    )
+                )
+            await copy.copy_records_to_table(
+                "invoices",
+                records=invoice_rows,
+                columns=[
+                    "id", "business_id", "customer_id", "customer_name", "customer_phone",
+                    "invoice_number", "business_name", "total_amount", "created_at",
+                    "updated_at", "due_date", "status", "notes",
+                ],
+            )
+            await copy.copy_records_to_table(
+                "line_items",
+                records=item_rows,
+                columns=[
+                    "invoice_id", "product_name", "unit_price", "quantity", "type",
+                    "description", "transaction_value",
+                ],
+            )
+            logger.info("Copied %d/%d invoices", start + len(invoice_rows), plan.invoices)
+
+        await conn.execute(text("SELECT setval('users_id_seq', :id)"), {"id": len(users)})
+        await conn.execute(
+            text("SELECT setval('invoices_id_seq', :id)"), {"id": max(invoice_id, 1)}
+        )
+        await conn.execute(
+            text(
+                "INSERT INTO invoice_counters (business_id, last_number) "
+                "SELECT business_id, count(*) FROM invoices GROUP BY business_id"
+            )
+        )
+        db = AsyncSession(bind=conn)
+        await crud.rebuild_user_stats(db)
+        await crud.rebuild_invoice_rollups(db)
+        await crud.refresh_search_vectors(db, true())
+        await db.close()
+
+    async with async_engine.connect() as conn:
+        await conn.execute(text("ANALYZE"))
+    logger.info(
+        "Seeded %d invoices for %d businesses and %d customers in %.1fs",
+        plan.invoices, plan.businesses, plan.customers, time.perf_counter() - started,
+    )
+    return plan
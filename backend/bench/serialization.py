@@ -0,0 +1,128 @@
+"""CPU cost of encoding a list of invoices, per path.
+
+- fastapi: what a route returning ORM rows with
+  response_model=List[InvoiceOut] does, via FastAPI's own
+  serialize_response and JSONResponse.
+- validated: app.serialization with a TypeAdapter and dump_json.
+- trusted: app.serialization reading the rows without validation.
+
+The rows are transient ORM objects built in memory, so no database is
+needed and only serialization is measured. Every path must produce the
+same JSON document.
+"""
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app import models, schemas, serialization
+
+from . import seed
+
+
+def build_invoices(count: int, rng_seed: int = 42) -> list[models.Invoice]:
+    rnd = random.Random(rng_seed)
+    now = datetime.now()
+    customers = [
+        models.User(
+            id=index + 2,
+            username=f"bench_customer_{index}",
+            full_name=seed._name(rnd),
+            phone_number=seed.customer_phone(index),
+            created_at=now,
+        )
+        for index in range(50)
+    ]
+    invoices = []
+    for index in range(count):
+        items = []
+        for _ in range(rnd.randint(1, 4)):
+            product, price = rnd.choice(seed.PRODUCTS)
+            quantity = rnd.randint(1, 10)
+            items.append(
+                models.LineItem(
+                    product_name=product,
+                    unit_price=price,
+                    quantity=quantity,
+                    type=models.LineItemTypeEnum.product,
+                    description=None,
+                    transaction_value=price * quantity,
+                )
+            )
+        customer = rnd.choice(customers) if rnd.random() < 0.6 else None
+        invoices.append(
+            models.Invoice(
+                id=index + 1,
+                business_id=1,
+                customer=customer,
+                customer_name=customer.full_name if customer else seed._name(rnd),
+                customer_phone=customer.phone_number if customer else None,
+                invoice_number=f"INV-1-{index + 1:05d}",
+                business_name="Bench Shop 0",
+                total_amount=sum(item.transaction_value for item in items),
+                created_at=now - timedelta(minutes=index),
+                due_date=now + timedelta(days=30),
+                status=rnd.choice(seed.STATUSES),
+                notes="",
+                line_items=items,
+            )
+        )
+    return invoices
+
+
+async def _fastapi_body(field, invoices) -> bytes:
+    content = await serialize_response(field=field, response_content=invoices)
+    return JSONResponse(content).body
+
+
+async def _measure(invoices, repeat: int) -> dict:
+    field = create_model_field(
+        "Response_bench", List[schemas.InvoiceOut], mode="serialization"
+    )
+    paths = {
+        "fastapi": lambda: _fastapi_body(field, invoices),
+        "validated": lambda: serialization.invoice_list_json(invoices, trusted=False),
+        "trusted": lambda: serialization.invoice_list_json(invoices, trusted=True),
+    }
+    bodies, timings = {}, {}
+    for name, encode in paths.items():
+        samples = []
+        for _ in range(repeat):
+            started = time.process_time()
+            body = encode()
+            if asyncio.iscoroutine(body):
+                body = await body
+            samples.append(time.process_time() - started)
+        bodies[name] = body
+        timings[name] = samples
+
+    expected = json.loads(bodies["fastapi"])
+    for name, body in bodies.items():
+        if json.loads(body) != expected:
+            raise AssertionError(f"The {name} path encodes invoices differently")
+    return {name: (samples, len(bodies[name])) for name, samples in timings.items()}
+
+
+def measure(invoices: int, repeat: int) -> dict:
+    """Median CPU milliseconds per path, also scaled to 1,000 invoices."""
+    rows = build_invoices(invoices)
+    measured = asyncio.run(_measure(rows, repeat))
+    baseline = statistics.median(measured["fastapi"][0])
+    results = {}
+    for name, (samples, size) in measured.items():
+        median = statistics.median(samples)
+        results[name] = {
+            "cpu_ms": round(median * 1000, 3),
+            "cpu_ms_per_1000": round(median * 1000 * 1000 / invoices, 3),
+            "saved_ms_per_1000": round((baseline - median) * 1000 * 1000 / invoices, 3),
+            "speedup": round(baseline / median, 2) if median else None,
+            "bytes": size,
+        }
+    return results
@@ -0,0 +1,114 @@
+"""Cold start timings, each repetition in a fresh interpreter.
+
+In process, a child interpreter times importing app.main, running its
+lifespan startup, a first request that needs no database and a first
+and second request that query it. With ``server`` a uvicorn process is
+started instead and timed until it answers its first request.
+
+Only the standard library is imported at module level, so the child's
+import timing is not shortened by modules this file already loaded.
+"""
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# an unknown phone number: one query, no bcrypt
+LOGIN_PROBE = {"username": "0700000000", "password": "startup-probe"}
+
+
+def _child():
+    started = time.perf_counter()
+    from app.main import app
+
+    imported = time.perf_counter()
+    import asyncio
+
+    import httpx
+
+    async def requests() -> dict:
+        timings = {}
+        lifespan_started = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            timings["startup_ms"] = (time.perf_counter() - lifespan_started) * 1000
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+                for name, send in (
+                    ("first_request_ms", lambda: client.get("/")),
+                    ("first_db_request_ms", lambda: client.post("/users/token", data=LOGIN_PROBE)),
+                    ("second_db_request_ms", lambda: client.post("/users/token", data=LOGIN_PROBE)),
+                ):
+                    request_started = time.perf_counter()
+                    await send()
+                    timings[name] = (time.perf_counter() - request_started) * 1000
+        return timings
+
+    timings = {"import_ms": (imported - started) * 1000, **asyncio.run(requests())}
+    print(json.dumps(timings))
+
+
+def _in_process() -> dict:
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", "from bench.startup import _child; _child()"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _server(timeout: float = 60.0) -> dict:
+    import httpx
+
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("The server exited during startup")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"The server did not answer within {timeout:.0f}s")
+            try:
+                httpx.get(f"{url}/", timeout=1.0)
+                break
+            except httpx.TransportError:
+                time.sleep(0.01)
+        timings = {"ready_ms": (time.perf_counter() - started) * 1000}
+        request_started = time.perf_counter()
+        httpx.post(f"{url}/users/token", data=LOGIN_PROBE, timeout=30.0)
+        timings["first_db_request_ms"] = (time.perf_counter() - request_started) * 1000
+        return timings
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def measure(repeat: int, server: bool = False) -> dict:
+    """Median, min and max of each timing over ``repeat`` cold starts."""
+    runs = [(_server() if server else _in_process()) for _ in range(repeat)]
+    return {
+        name: {
+            "median": round(statistics.median(run[name] for run in runs), 3),
+            "min": round(min(run[name] for run in runs), 3),
+            "max": round(max(run[name] for run in runs), 3),
+        }
+        for name in runs[0]
+    }
@@ -0,0 +1,195 @@
+"""Scripted API workloads.
+
+Each workload sends one measured request per call, as the seeded bench
+business (see bench/seed.py). Requests a workload needs beforehand, like
+creating the invoice that ``delete`` then deletes, are sent unmeasured.
+"""
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import httpx
+
+from . import seed
+from .metrics import EndpointStats, count_queries
+
+
+SEARCH_TERMS = ["jane", "mwangi", "rice", "delivery", "0780", "kamau oil", "consult"]
+
+
+def _invoice_payload(rnd: random.Random, username: str) -> dict:
+    line_items = []
+    for _ in range(rnd.randint(1, 4)):
+        product, price = rnd.choice(seed.PRODUCTS)
+        line_items.append(
+            {
+                "product_name": product,
+                "unit_price": price,
+                "quantity": rnd.randint(1, 10),
+                "description": None,
+                "type": "product",
+            }
+        )
+    return {
+        "username": username,
+        "business_name": "Bench Shop 0",
+        "customer_name": "Bench Customer",
+        "customer_phone": seed.customer_phone(rnd.randrange(10)),
+        "total_amount": 0,
+        "due_date": (datetime.now() + timedelta(days=30)).isoformat(),
+        "status": "sent",
+        "notes": "",
+        "line_items": line_items,
+    }
+
+
+class BenchSession:
+    """A logged-in client plus the invoice numbers workloads pick from."""
+
+    def __init__(self, client: httpx.AsyncClient, count_queries_enabled: bool, rng_seed: int = 7):
+        self.client = client
+        self.count_queries_enabled = count_queries_enabled
+        self.rnd = random.Random(rng_seed)
+        self.username = seed.business_username(0)
+        self.phone = seed.business_phone(0)
+        self.headers: dict = {}
+        self.known: list[str] = []
+        self.created: deque[str] = deque()
+
+    async def setup(self):
+        response = await self.login()
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await self.client.get(
+            f"/invoices/business/{self.username}",
+            params={"limit": 200},
+            headers=self.headers,
+        )
+        response.raise_for_status()
+        self.known = [invoice["invoice_number"] for invoice in response.json()]
+        if not self.known:
+            raise RuntimeError("The bench business has no invoices; run `python -m bench seed` first")
+
+    def login(self):
+        return self.client.post(
+            "/users/token", data={"username": self.phone, "password": seed.BENCH_PASSWORD}
+        )
+
+    async def measure(self, stats: EndpointStats, request) -> httpx.Response:
+        """Send ``request()`` and record its latency, status and query count."""
+        with count_queries() as queries:
+            started = time.perf_counter()
+            response = await request()
+            elapsed = time.perf_counter() - started
+        stats.observe(
+            elapsed,
+            ok=response.status_code < 400,
+            queries=queries[0] if self.count_queries_enabled else None,
+        )
+        return response
+
+    async def create_invoice(self) -> httpx.Response:
+        response = await self.client.post(
+            "/invoices/create",
+            json=_invoice_payload(self.rnd, self.username),
+            headers=self.headers,
+        )
+        if response.status_code == 200:
+            self.created.append(response.json()["invoice_number"])
+        return response
+
+
+async def login(session: BenchSession, stats: EndpointStats):
+    await session.measure(stats, session.login)
+
+
+async def create(session: BenchSession, stats: EndpointStats):
+    await session.measure(stats, session.create_invoice)
+
+
+async def list_invoices(session: BenchSession, stats: EndpointStats):
+    await session.measure(
+        stats,
+        lambda: session.client.get(
+            f"/invoices/business/{session.username}", headers=session.headers
+        ),
+    )
+
+
+async def list_filtered(session: BenchSession, stats: EndpointStats):
+    status = session.rnd.choice(["sent", "paid", "overdue"])
+    due_from = datetime.now() - timedelta(days=session.rnd.randrange(30, 900))
+    await session.measure(
+        stats,
+        lambda: session.client.get(
+            f"/invoices/business/{session.username}",
+            params={"status": status, "due_from": due_from.isoformat(), "limit": 50},
+            headers=session.headers,
+        ),
+    )
+
+
+async def get(session: BenchSession, stats: EndpointStats):
+    invoice_number = session.rnd.choice(session.known)
+    await session.measure(
+        stats,
+        lambda: session.client.get(f"/invoices/{invoice_number}", headers=session.headers),
+    )
+
+
+async def search(session: BenchSession, stats: EndpointStats):
+    q = session.rnd.choice(SEARCH_TERMS)
+    await session.measure(
+        stats,
+        lambda: session.client.get(
+            f"/invoices/search/{session.username}", params={"q": q}, headers=session.headers
+        ),
+    )
+
+
+async def dashboard(session: BenchSession, stats: EndpointStats):
+    await session.measure(
+        stats,
+        lambda: session.client.get(
+            f"/analytics/{session.username}/dashboard", headers=session.headers
+        ),
+    )
+
+
+async def edit(session: BenchSession, stats: EndpointStats):
+    invoice_number = session.rnd.choice(session.known)
+    payload = _invoice_payload(session.rnd, session.username)
+    payload["status"] = session.rnd.choice(["sent", "paid"])
+    await session.measure(
+        stats,
+        lambda: session.client.put(
+            f"/invoices/edit/{invoice_number}", json=payload, headers=session.headers
+        ),
+    )
+
+
+async def delete(session: BenchSession, stats: EndpointStats):
+    # only deletes invoices this run created, so the seeded data set stays intact
+    if not session.created:
+        (await session.create_invoice()).raise_for_status()
+    invoice_number = session.created.popleft()
+    await session.measure(
+        stats,
+        lambda: session.client.put(
+            f"/invoices/delete/{invoice_number}", headers=session.headers
+        ),
+    )
+
+
+WORKLOADS = {
+    "login": login,
+    "create": create,
+    "list": list_invoices,
+    "list_filtered": list_filtered,
+    "get": get,
+    "search": search,
+    "dashboard": dashboard,
+    "edit": edit,
+    "delete": delete,
+}
@@ -0,0 +1,80 @@
+"""Bulk test data, inserted set-based so large histories stay fast to build."""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def add_users(db: AsyncSession, count: int) -> list:
+    """Users with stats rows; returns (id, username, phone_number) rows in creation order."""
+    users = (
+        await db.execute(
+            text(
+                """
+                INSERT INTO users (username, full_name, phone_number, password, created_at, disabled)
+                SELECT 'test_user_' || g, 'Test User ' || g, '09' || lpad(g::text, 8, '0'), '',
+                    now(), false
+                FROM generate_series(1, :count) g
+                RETURNING id, username, phone_number
+                """
+            ),
+            {"count": count},
+        )
+    ).all()
+    await db.execute(
+        text(
+            """
+            INSERT INTO user_stats (user_id, total_invoices_sent, total_invoices_received,
+                total_amount_paid_in, total_amount_paid_out, invoices_version)
+            SELECT unnest(CAST(:ids AS integer[])), 0, 0, 0, 0, 0
+            """
+        ),
+        {"ids": [user.id for user in users]},
+    )
+    return users
+
+
+async def add_invoices(
+    db: AsyncSession,
+    business_ids: list[int],
+    customer_ids: list[int],
+    count: int,
+    line_items: int = 2,
+) -> list[int]:
+    """Invoices spread round robin over the businesses and customers, newest
+    first by id; every seventh has no registered customer. Returns their ids."""
+    invoice_ids = (
+        await db.scalars(
+            text(
+                """
+                INSERT INTO invoices (business_id, customer_id, customer_name, customer_phone,
+                    invoice_number, business_name, total_amount, created_at, updated_at,
+                    due_date, status, notes)
+                SELECT b[1 + g % cardinality(b)],
+                    CASE WHEN g % 7 = 6 THEN NULL ELSE c[1 + (g * 31) % cardinality(c)] END,
+                    'Customer ' || g, NULL, 'TEST-' || gen_random_uuid(), 'Test Business', 10 * :line_items,
+                    now() - g * interval '1 minute', now(), now() + interval '30 days',
+                    (ARRAY['sent', 'paid', 'overdue'])[1 + g % 3]::invoicestatus, ''
+                FROM generate_series(1, :count) g,
+                    CAST(:business_ids AS integer[]) b, CAST(:customer_ids AS integer[]) c
+                RETURNING id
+                """
+            ),
+            {
+                "count": count,
+                "line_items": line_items,
+                "business_ids": business_ids,
+                "customer_ids": customer_ids,
+            },
+        )
+    ).all()
+    await db.execute(
+        text(
+            """
+            INSERT INTO line_items (invoice_id, product_name, unit_price, quantity, type,
+                transaction_value)
+            SELECT i, 'Item ' || n, 10, 1, 'product', 10
+            FROM unnest(CAST(:ids AS integer[])) i, generate_series(1, :line_items) n
+            """
+        ),
+        {"ids": list(invoice_ids), "line_items": line_items},
+    )
+    return list(invoice_ids)
@@ -0,0 +1,38 @@
+"""Internal routes exist only for callers presenting the configured token."""
+import httpx
+import pytest
+
+from app.config import settings
+from app.main import app
+
+
+pytestmark = pytest.mark.anyio
+
+INTERNAL_ROUTES = ["/internal/metrics/db-pool", "/metrics"]
+
+
+async def _get(path: str, headers: dict) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(path, headers=headers)
+
+
+@pytest.mark.parametrize("path", INTERNAL_ROUTES)
+@pytest.mark.parametrize(
+    "configured, sent",
+    [
+        (None, {}),
+        (None, {"X-Internal-Token": ""}),
+        ("secret", {}),
+        ("secret", {"X-Internal-Token": "wrong"}),
+    ],
+)
+async def test_internal_route_is_hidden(monkeypatch, path, configured, sent):
+    monkeypatch.setattr(settings, "internal_token", configured)
+    assert (await _get(path, sent)).status_code == 404
+
+
+@pytest.mark.parametrize("path", INTERNAL_ROUTES)
+async def test_internal_route_with_token(monkeypatch, path):
+    monkeypatch.setattr(settings, "internal_token", "secret")
+    assert (await _get(path, {"X-Internal-Token": "secret"})).status_code == 200
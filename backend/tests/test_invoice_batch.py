@@ -0,0 +1,63 @@
+"""Batch invoice creation reports each row's own error."""
+import pytest
+from sqlalchemy import func, select
+
+from app import crud, models, schemas
+
+from . import data
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def invoice_numbers(monkeypatch):
+    # the counter is reserved on its own committed connection, which cannot
+    # see the business created inside the test transaction
+    async def generate_invoice_numbers(business_id: int, count: int = 1) -> list[str]:
+        return [f"TEST-{business_id}-{number}" for number in range(count)]
+
+    monkeypatch.setattr(crud, "generate_invoice_numbers", generate_invoice_numbers)
+
+
+def _invoice(business, customer, line_item_type="product") -> schemas.InvoiceCreate:
+    return schemas.InvoiceCreate.model_validate(
+        {
+            "username": business.username,
+            "business_name": "Test Business",
+            "customer_name": "Test Customer",
+            "customer_phone": customer.phone_number,
+            "total_amount": 20,
+            "due_date": "2030-01-01T00:00:00",
+            "status": "sent",
+            "line_items": [
+                {
+                    "product_name": "Item",
+                    "unit_price": 10,
+                    "quantity": 2,
+                    "description": None,
+                    "type": line_item_type,
+                }
+            ],
+        }
+    )
+
+
+async def test_invalid_line_item_type_fails_only_its_row(db, monkeypatch):
+    monkeypatch.setattr(crud.settings, "sms_invoice_notifications", True)
+    business, customer = await data.add_users(db, 2)
+    invoices = [_invoice(business, customer) for _ in range(4)]
+    invoices[2] = _invoice(business, customer, line_item_type="gadget")
+
+    results = await crud.create_invoices_batch(db, business.id, business.username, invoices)
+
+    assert [result.error for result in results] == [
+        None, None, "Invalid line item type 'gadget'", None
+    ]
+    assert all(result.invoice_number for index, result in enumerate(results) if index != 2)
+    queued = await db.scalar(
+        select(func.count())
+        .select_from(models.SmsOutbox)
+        .where(models.SmsOutbox.phone_number == customer.phone_number)
+    )
+    assert queued == 3
@@ -0,0 +1,65 @@
+"""Imported invoices get new numbers, and the response says which."""
+import io
+
+import pytest
+from sqlalchemy import select
+
+from app import invoice_import, models
+
+from . import data
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def invoice_numbers(monkeypatch):
+    # the counter is reserved on its own committed connection, which cannot
+    # see the business created inside the test transaction
+    async def generate_invoice_numbers(business_id: int, count: int = 1) -> list[str]:
+        start = generate_invoice_numbers.next
+        generate_invoice_numbers.next += count
+        return [f"TEST-{business_id}-{number}" for number in range(start, start + count)]
+
+    generate_invoice_numbers.next = 0
+    monkeypatch.setattr(invoice_import, "generate_invoice_numbers", generate_invoice_numbers)
+
+
+def _upload(customer) -> io.BytesIO:
+    rows = [
+        "invoice_number,customer_phone,total_amount,due_date,status,"
+        "product_name,unit_price,quantity",
+        f"OLD-1,{customer.phone_number},20,2030-01-01,paid,Item,10,2",
+        f"OLD-1,{customer.phone_number},20,2030-01-01,paid,Other,5,1",
+        f"OLD-2,{customer.phone_number},10,2030-01-01,bogus,Item,10,1",
+        f"OLD-3,{customer.phone_number},10,2030-01-01,sent,Item,10,1",
+    ]
+    return io.BytesIO("\n".join(rows).encode())
+
+
+async def test_import_maps_file_numbers_to_new_ones(db):
+    business, customer = await data.add_users(db, 2)
+
+    result = await invoice_import.import_invoices(
+        db, business.id, business.username, _upload(customer), "invoices.csv"
+    )
+
+    assert (result.imported, result.failed) == (2, 1)
+    assert result.errors[0].invoice_number == "OLD-2"
+    assert result.invoice_numbers == {
+        "OLD-1": f"TEST-{business.id}-0",
+        "OLD-3": f"TEST-{business.id}-1",
+    }
+    invoices = {
+        invoice.invoice_number: invoice
+        for invoice in await db.scalars(
+            select(models.Invoice).where(models.Invoice.business_id == business.id)
+        )
+    }
+    assert set(invoices) == set(result.invoice_numbers.values())
+    assert invoices[result.invoice_numbers["OLD-1"]].total_amount == 25
+    assert invoices[result.invoice_numbers["OLD-1"]].customer_id == customer.id
+
+    stats = await db.get(models.UserStats, business.id)
+    await db.refresh(stats)
+    assert (stats.total_invoices_sent, stats.total_amount_paid_in) == (2, 25)
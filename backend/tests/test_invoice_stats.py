@@ -0,0 +1,62 @@
+"""Invoice writes update user_stats rows in user_id order, before the rollups."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app import crud, models, schemas
+from app.jobs import overdue
+
+from . import data
+
+
+pytestmark = pytest.mark.anyio
+
+
+def _stats_user_ids(statements) -> list[int]:
+    # the user_id of "UPDATE user_stats ... WHERE user_stats.user_id = $n" binds last
+    return [
+        parameters[-1] for statement, parameters in statements
+        if statement.startswith("UPDATE user_stats")
+    ]
+
+
+@pytest.fixture
+async def invoice(db):
+    """An invoice whose business has a higher user_id than its customer."""
+    customer, business = await data.add_users(db, 2)
+    [invoice_id] = await data.add_invoices(db, [business.id], [customer.id], count=1)
+    return await db.scalar(select(models.Invoice).where(models.Invoice.id == invoice_id))
+
+
+async def test_update_locks_stats_in_user_id_order(db, statements, invoice):
+    statements.clear()
+    update = schemas.InvoiceUpdate(
+        total_amount=invoice.total_amount, due_date=invoice.due_date, status="paid", line_items=[]
+    )
+    await crud.update_invoice(db, invoice, update)
+    assert _stats_user_ids(statements) == sorted([invoice.customer_id, invoice.business_id])
+
+
+async def test_delete_locks_stats_in_user_id_order(db, statements, invoice):
+    statements.clear()
+    await crud.delete_invoice(db, invoice)
+    assert _stats_user_ids(statements) == sorted([invoice.customer_id, invoice.business_id])
+
+
+async def test_overdue_sweep_locks_stats_before_rollups(db, statements, invoice):
+    await db.execute(
+        update(models.Invoice)
+        .where(models.Invoice.id == invoice.id)
+        .values(status=models.InvoiceStatus.sent)
+    )
+    statements.clear()
+    swept = await overdue.sweep_chunk(
+        db, datetime.now() + timedelta(days=60), chunk_size=10, reminders=False
+    )
+    assert swept == 1
+    tables = [
+        table for statement, _ in statements
+        for table in ("user_stats", "invoice_daily_rollups") if table in statement
+    ]
+    assert tables == ["user_stats", "invoice_daily_rollups"]
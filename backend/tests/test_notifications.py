@@ -0,0 +1,150 @@
+"""SmsDispatcher against FakeTransport: claiming, batching, retries and final status."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app import crud, models
+from app.notifications import FakeTransport, SmsDispatcher
+
+
+pytestmark = pytest.mark.anyio
+
+
+def _dispatcher(session_factory, transport, **options) -> SmsDispatcher:
+    options = {
+        "recipients_per_request": 100,
+        "rate_per_second": 0,
+        "max_attempts": 3,
+        "retry_base_seconds": 30,
+        **options,
+    }
+    return SmsDispatcher(transport=transport, session_factory=session_factory, **options)
+
+
+async def _queue(db, messages: list[tuple[str, str]]) -> list[int]:
+    """Queue (phone_number, message) pairs; returns the outbox ids."""
+    for phone_number, message in messages:
+        crud.enqueue_sms(db, phone_number, message)
+    await db.commit()
+    phone_numbers = {phone_number for phone_number, _ in messages}
+    return list(
+        await db.scalars(
+            select(models.SmsOutbox.id)
+            .where(models.SmsOutbox.phone_number.in_(phone_numbers))
+            .order_by(models.SmsOutbox.id)
+        )
+    )
+
+
+async def _rows(db, ids: list[int]) -> list[models.SmsOutbox]:
+    return list(
+        await db.scalars(
+            select(models.SmsOutbox)
+            .where(models.SmsOutbox.id.in_(ids))
+            .order_by(models.SmsOutbox.id)
+            .execution_options(populate_existing=True)
+        )
+    )
+
+
+async def test_identical_messages_share_sends(db, session_factory):
+    ids = await _queue(
+        db,
+        [
+            ("0790000001", "Invoice ready"),
+            ("0790000002", "Invoice ready"),
+            ("0790000003", "Invoice ready"),
+            ("0790000004", "Payment received"),
+        ],
+    )
+    transport = FakeTransport()
+    dispatcher = _dispatcher(session_factory, transport, recipients_per_request=2)
+
+    await dispatcher.dispatch_once()
+
+    # one send per message and chunk of recipients, in no particular order
+    assert sorted((message, len(numbers)) for message, numbers in transport.sent) == [
+        ("Invoice ready", 1), ("Invoice ready", 2), ("Payment received", 1)
+    ]
+    recipients = {}
+    for message, numbers in transport.sent:
+        recipients.setdefault(message, set()).update(numbers)
+    assert recipients == {
+        "Invoice ready": {"+254790000001", "+254790000002", "+254790000003"},
+        "Payment received": {"+254790000004"},
+    }
+    for row in await _rows(db, ids):
+        assert row.status == models.SmsStatus.sent
+        assert row.attempts == 1
+        assert row.sent_at is not None
+        assert row.provider_message_id
+
+
+async def test_claimed_rows_are_leased(db, session_factory):
+    ids = await _queue(db, [("0790000001", "Invoice ready")])
+    dispatcher = _dispatcher(session_factory, FakeTransport())
+
+    claimed = await dispatcher.claim()
+    assert [row.id for row in claimed if row.id in ids] == ids
+    assert not [row for row in await dispatcher.claim() if row.id in ids]
+
+
+async def test_retryable_failure_backs_off_until_attempts_run_out(db, session_factory):
+    [failing, delivered] = await _queue(
+        db, [("0790000001", "Invoice ready"), ("0790000002", "Invoice ready")]
+    )
+    transport = FakeTransport(fail_numbers={"+254790000001"})
+    dispatcher = _dispatcher(session_factory, transport, max_attempts=2)
+
+    before = datetime.now()
+    await dispatcher.dispatch_once()
+    row, other = await _rows(db, [failing, delivered])
+    assert other.status == models.SmsStatus.sent
+    assert row.status == models.SmsStatus.pending
+    assert row.attempts == 1
+    assert row.last_error == "Failed"
+    # 30 seconds of backoff, with jitter
+    assert row.next_attempt_at >= before + timedelta(seconds=24)
+
+    await db.execute(
+        update(models.SmsOutbox)
+        .where(models.SmsOutbox.id == failing)
+        .values(next_attempt_at=datetime.now())
+    )
+    await db.commit()
+    await dispatcher.dispatch_once()
+    [row] = await _rows(db, [failing])
+    assert row.status == models.SmsStatus.failed
+    assert row.attempts == 2
+    assert len(transport.sent) == 2
+
+
+async def test_permanent_failure_is_not_retried(db, session_factory):
+    [failing] = await _queue(db, [("0790000001", "Invoice ready")])
+    transport = FakeTransport(fail_numbers={"+254790000001"}, retryable=False)
+
+    await _dispatcher(session_factory, transport).dispatch_once()
+
+    [row] = await _rows(db, [failing])
+    assert row.status == models.SmsStatus.failed
+    assert row.attempts == 1
+
+
+async def test_expired_lease_on_last_attempt_fails(db, session_factory):
+    [crashed] = await _queue(db, [("0790000001", "Invoice ready")])
+    # what a dispatcher that died during its third and last send leaves behind
+    await db.execute(
+        update(models.SmsOutbox)
+        .where(models.SmsOutbox.id == crashed)
+        .values(attempts=3, next_attempt_at=datetime.now() - timedelta(seconds=1))
+    )
+    await db.commit()
+    transport = FakeTransport()
+
+    await _dispatcher(session_factory, transport, max_attempts=3).dispatch_once()
+
+    [row] = await _rows(db, [crashed])
+    assert row.status == models.SmsStatus.failed
+    assert row.last_error == "Lease expired on the last attempt"
+    assert transport.sent == []
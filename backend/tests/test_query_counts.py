@@ -0,0 +1,51 @@
+"""Invoice listings send the same number of statements for any page size."""
+import pytest
+
+from app import crud, schemas
+
+from . import data
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def users(db):
+    business, customer = await data.add_users(db, 2)
+    await data.add_invoices(db, [business.id], [customer.id], count=60)
+    return business, customer
+
+
+async def _by_business(db, business, customer, params):
+    return await crud.get_invoices_by_business(db, business.id, params)
+
+
+async def _by_customer(db, business, customer, params):
+    return await crud.get_invoices_by_customer(db, customer.id, params)
+
+
+async def _by_user(db, business, customer, params):
+    return await crud.get_all_user_invoices(db, customer.username, params)
+
+
+# listing -> statements: the invoices, then the page's line items in one
+# SELECT ... IN; the combined listing looks the user up first
+LISTINGS = {
+    "business": (_by_business, 2),
+    "customer": (_by_customer, 2),
+    "user": (_by_user, 3),
+}
+
+
+@pytest.mark.parametrize("listing", LISTINGS)
+async def test_listing_statement_count_is_constant(db, statements, users, listing):
+    list_invoices, expected = LISTINGS[listing]
+    for limit in (1, 50):
+        statements.clear()
+        invoices, _ = await list_invoices(db, *users, schemas.InvoiceListParams(limit=limit))
+        # serializing reads line_items and customer; a lazy load would show up here
+        pages = [schemas.InvoiceOut.model_validate(invoice) for invoice in invoices]
+        assert len(pages) == limit
+        assert all(page.line_items for page in pages)
+        assert any(page.customer for page in pages)
+        assert len(statements) == expected, [statement for statement, _ in statements]
@@ -0,0 +1,119 @@
+"""The hot crud queries read invoices, line_items and user_stats through indexes."""
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app import crud, export, schemas
+
+from . import data
+
+
+pytestmark = pytest.mark.anyio
+
+INDEXED_TABLES = ("invoices", "line_items", "user_stats")
+SEQ_SCAN = re.compile(rf"Seq Scan on ({'|'.join(INDEXED_TABLES)})\b")
+# a full sort node, as opposed to the Incremental Sort over line items of presorted invoices
+FULL_SORT = re.compile(r"^\s*(->\s*)?Sort\s+\(", re.MULTILINE)
+
+
+@pytest.fixture
+async def users(db):
+    """A history big enough that the planner prefers indexes where they apply.
+
+    Like the busiest merchants, one business has half of all invoices; a
+    query that cannot use an index for it has to scan the table.
+    """
+    users = await data.add_users(db, 2000)
+    business, customers = users[0], [user.id for user in users[100:]]
+    await data.add_invoices(db, [business.id], customers, count=15000)
+    await data.add_invoices(db, [user.id for user in users[1:100]], customers, count=15000)
+    for table in INDEXED_TABLES:
+        await db.execute(text(f"ANALYZE {table}"))
+    # and a customer with about 15
+    return business, users[105]
+
+
+async def _next_page(list_invoices, db, user_id, **filters):
+    """Both pages of a listing, so the cursor predicate is planned too."""
+    _, cursor = await list_invoices(db, user_id, schemas.InvoiceListParams(limit=10, **filters))
+    await list_invoices(db, user_id, schemas.InvoiceListParams(limit=10, cursor=cursor, **filters))
+
+
+async def _business_list(db, business, customer):
+    await _next_page(crud.get_invoices_by_business, db, business.id)
+
+
+async def _business_list_filtered(db, business, customer):
+    await _next_page(
+        crud.get_invoices_by_business, db, business.id,
+        status="paid", due_from=datetime.now(), due_to=datetime.now() + timedelta(days=60),
+    )
+
+
+async def _customer_list(db, business, customer):
+    await _next_page(crud.get_invoices_by_customer, db, customer.id)
+
+
+async def _user_list(db, business, customer):
+    for user in (business, customer):
+        await _next_page(crud.get_all_user_invoices, db, user.username)
+
+
+async def _single_invoice(db, business, customer):
+    [invoice], _ = await crud.get_invoices_by_customer(
+        db, customer.id, schemas.InvoiceListParams(limit=1)
+    )
+    await crud.get_invoice_for_user(db, customer.id, invoice.invoice_number)
+    await crud.get_business_invoice(db, invoice.business_id, invoice.invoice_number)
+
+
+async def _stats(db, business, customer):
+    await crud.get_user_stats(db, business.id)
+    await crud.get_invoice_list_version(db, customer.id)
+    await crud.update_business_stats(db, business.id, invoices=1)
+    await crud.update_customer_stats(db, customer.id, invoices=1)
+
+
+HOT_QUERIES = {
+    "business list": _business_list,
+    "business list, filtered": _business_list_filtered,
+    "customer list": _customer_list,
+    "user list": _user_list,
+    "single invoice": _single_invoice,
+    "stats": _stats,
+}
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+async def test_hot_queries_use_indexes(db, statements, users, name):
+    statements.clear()
+    await HOT_QUERIES[name](db, *users)
+    captured = list(statements)
+    assert captured
+
+    connection = await db.connection()
+    for statement, parameters in captured:
+        plan = "\n".join(
+            row[0] for row in await connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        )
+        assert not SEQ_SCAN.search(plan), f"{statement}\n{plan}"
+
+
+async def test_export_streams_in_index_order(db, statements, users):
+    business, _ = users
+    # one of the ordinary businesses, with about 150 invoices
+    other = await db.scalar(
+        text("SELECT business_id FROM invoices WHERE business_id != :id LIMIT 1"), {"id": business.id}
+    )
+    statements.clear()
+    await db.execute(export._export_query(other, schemas.InvoiceExportParams()))
+    [(statement, parameters)] = statements
+
+    connection = await db.connection()
+    plan = "\n".join(
+        row[0] for row in await connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+    )
+    assert not FULL_SORT.search(plan), plan
+    assert not SEQ_SCAN.search(plan), plan
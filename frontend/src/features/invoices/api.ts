@@ -2,23 +2,34 @@ import { authFetch } from "../../api";
 import type { InvoiceCreate, InvoiceDelete, InvoiceType, InvoiceUpdate } from "./types";
 
 
-export const getAllUserInvoicesAPI = async (
-  username: string
-): Promise<InvoiceType[]> => {
-  const url = `/invoices/user/${username}`;
+// The list endpoints return one page at a time, newest first, with the
+// cursor of the next page in the X-Next-Cursor header
+const INVOICE_PAGE_SIZE = 200;
+
+const getAllInvoicePages = async (path: string): Promise<InvoiceType[]> => {
+  const invoices: InvoiceType[] = [];
+  let cursor: string | null = null;
   try {
-    const response = await authFetch(url, {
-      method: "GET",
-      headers: {
-        "Content-Type": "application/json",
-      },
-    });
-    if (!response.ok) {
-      throw new Error(`Server error: ${response.status}`);
-    }
-    const data = await response.json();
+    do {
+      const params = new URLSearchParams({ limit: String(INVOICE_PAGE_SIZE) });
+      if (cursor) {
+        params.set("cursor", cursor);
+      }
+      const response = await authFetch(`${path}?${params}`, {
+        method: "GET",
+        headers: {
+          "Content-Type": "application/json",
+        },
+      });
+      if (!response.ok) {
+        throw new Error(`Server error: ${response.status}`);
+      }
+      const page: InvoiceType[] = await response.json();
+      invoices.push(...page);
+      cursor = response.headers.get("X-Next-Cursor");
+    } while (cursor);
 
-    return data;
+    return invoices;
   } catch (error) {
     if (error instanceof Error) {
       throw error;
@@ -27,56 +38,17 @@ export const getAllUserInvoicesAPI = async (
   }
 };
 
-export const getUserBusinessInvoicesAPI = async (
+export const getAllUserInvoicesAPI = async (
   username: string
-): Promise<InvoiceType[]> => {
-  const url = `/invoices/business/${username}`;
-  try {
-    const response = await authFetch(url, {
-      method: "GET",
-      headers: {
-        "Content-Type": "application/json",
-      },
-    });
-    if (!response.ok) {
-      throw new Error(`Server error: ${response.status}`);
-    }
-    const data = await response.json();
-
-    return data;
-  } catch (error) {
-    if (error instanceof Error) {
-      throw error;
-    }
-    throw new Error(`Unknown error: ${String(error)}`);
-  }
-};
+): Promise<InvoiceType[]> => getAllInvoicePages(`/invoices/user/${username}`);
 
+export const getUserBusinessInvoicesAPI = async (
+  username: string
+): Promise<InvoiceType[]> => getAllInvoicePages(`/invoices/business/${username}`);
 
 export const getUserCustomerInvoicesAPI = async (
   username: string
-): Promise<InvoiceType[]> => {
-  const url = `/invoices/customer/${username}`;
-  try {
-    const response = await authFetch(url, {
-      method: "GET",
-      headers: {
-        "Content-Type": "application/json",
-      },
-    });
-    if (!response.ok) {
-      throw new Error(`Server error: ${response.status}`);
-    }
-    const data = await response.json();
-
-    return data;
-  } catch (error) {
-    if (error instanceof Error) {
-      throw error;
-    }
-    throw new Error(`Unknown error: ${String(error)}`);
-  }
-};
+): Promise<InvoiceType[]> => getAllInvoicePages(`/invoices/customer/${username}`);
 
 
 export const createInvoiceAPI = async (